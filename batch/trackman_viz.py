@@ -1,109 +1,269 @@
 import os
+import sys
+import json
+import time
+import hashlib
 import datetime
-import matplotlib.pyplot as plt
-import pandas as pd
+import cProfile
+import argparse
+import traceback
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import matplotlib
+matplotlib.use('Agg')
+
+# shared trackman modules live next to this folder
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'trackman'))
+from session_store import ingest_csv, date_range, load_session
+from arsenal_agg import summarize_arsenal
+from chart_templates import plot_movement_chart, movement_chart_name
+from stage_metrics import StageTimer, append_jsonl
 
 # calculate yesterday's date
 today = datetime.date.today()
 yesterday = today - datetime.timedelta(days=1)
-date_str = yesterday.strftime("%Y-%m-%d")
 
-# directory paths
-data_dir = f"**PATH TO DATA FOLDER**\\{date_str}"
-viz_dir = f"**PATH TO VIZ FOLDER**\\{date_str}-Viz"
+# root directories holding one YYYY-MM-DD data folder and one YYYY-MM-DD-Viz folder per day
+data_root = "**PATH TO DATA FOLDER**"
+viz_root = "**PATH TO VIZ FOLDER**"
+
+# manifest of rendered csvs, used to skip sessions that have not changed since the last run
+manifest_path = os.path.join(viz_root, "trackman_viz_manifest.json")
+
+# bump when the plot changes so every session is rendered again on the next run
+plot_version = 1
+
+# default number of worker processes, one per core
+default_workers = os.cpu_count() or 1
+
+# per file stage timings are appended here in each visualization folder, one json object per line
+metrics_filename = "render_metrics.jsonl"
+
+# directory paths for a given date
+def day_dirs(date_str):
+    data_dir = f"{data_root}\\{date_str}"
+    viz_dir = f"{viz_root}\\{date_str}-Viz"
+    return data_dir, viz_dir
+
+# sha256 of a file's contents, read in blocks so large exports are not held in memory
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_manifest(path=manifest_path):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+# write to a temporary file first so an interrupted run never leaves a truncated manifest
+def save_manifest(manifest, path=manifest_path):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+# seconds to wait for the manifest lock, and age after which a lock left by a crashed process is removed
+manifest_lock_timeout = 30
+
+# exclusive lock file next to the manifest, held while it is read, merged and replaced
+@contextmanager
+def manifest_lock(path=manifest_path, timeout=manifest_lock_timeout):
+    lock_path = f"{path}.lock"
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) > timeout:
+                    os.remove(lock_path)
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{lock_path} is held by another process")
+            time.sleep(0.05)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        os.remove(lock_path)
+
+# add entries to the manifest on disk and return the merged manifest
+# the nightly run and trackman_watch.py share the file, so it is read again under the lock and only the
+# entries of this process are merged in, the other process's entries saved meanwhile are kept
+def update_manifest(entries, path=manifest_path):
+    with manifest_lock(path):
+        manifest = load_manifest(path)
+        manifest.update(entries)
+        save_manifest(manifest, path)
+    return manifest
+
+# a session is up to date if its contents, the plot version and the rendered png are all unchanged
+def is_current(entry, content_hash):
+    return (entry is not None
+            and entry['hash'] == content_hash
+            and entry['plot_version'] == plot_version
+            and os.path.exists(entry['output']))
+
+# read one session csv, plot its pitch movement and save the png
+# returns the png path and the wall time, cpu time and rss change of each stage
+# the chart chrome is built once per worker process and reused for every session it renders
+def render_session(data_path, viz_dir):
+    timer = StageTimer()
+
+    with timer.stage('read'):
+        df = load_session(data_path)
+    with timer.stage('aggregate'):
+        summary = summarize_arsenal(df)
+    with timer.stage('plot'):
+        template = plot_movement_chart(df, summary)
+
+    # always take the data back off, the template is reused for the next session
+    try:
+        with timer.stage('save'):
+            output_path = os.path.join(viz_dir, movement_chart_name(df))
+            template.fig.savefig(output_path, bbox_inches='tight', pad_inches=0.3)
+    finally:
+        template.clear()
+
+    return output_path, timer.as_dict()
+
+# one metrics line for a rendered session
+def metrics_record(run_started, data_path, stages):
+    return {
+        'run': run_started,
+        'file': os.path.basename(data_path),
+        'plot_version': plot_version,
+        'wall': round(sum(stage['wall'] for stage in stages.values()), 6),
+        'stages': stages,
+    }
+
+# render the n slowest sessions again under cProfile and save the stats in a profiles folder
+# done after the timed run so profiling overhead does not show up in the metrics
+def profile_slowest(rendered, viz_dir, n):
+    slowest = sorted(rendered, key=lambda item: -sum(stage['wall'] for stage in item[2].values()))[:n]
+    profile_dir = os.path.join(viz_dir, 'profiles')
+    os.makedirs(profile_dir, exist_ok=True)
+
+    for data_path, output_path, stages in slowest:
+        profiler = cProfile.Profile()
+        profiler.runcall(render_session, data_path, viz_dir)
+        profiler.dump_stats(os.path.join(profile_dir, f"{os.path.splitext(os.path.basename(data_path))[0]}.prof"))
+
+# render every csv in data_path, spread across a pool of worker processes
+# returns a list of (filename, output path, stage metrics) and a list of (filename, error) for failed files
+def render_all(data_paths, viz_dir, workers=default_workers):
+
+    rendered = []
+    errors = []
+
+    # a single worker renders in this process, useful for debugging
+    if workers <= 1:
+        for data_path in data_paths:
+            try:
+                rendered.append((data_path, *render_session(data_path, viz_dir)))
+            except Exception:
+                errors.append((data_path, traceback.format_exc()))
+        return rendered, errors
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(render_session, data_path, viz_dir): data_path for data_path in data_paths}
+
+        for future in as_completed(futures):
+            data_path = futures[future]
+            try:
+                rendered.append((data_path, *future.result()))
+            except Exception:
+                errors.append((data_path, traceback.format_exc()))
+
+    return rendered, errors
+
+# print failed files and save the tracebacks next to the visualizations, render and store ingest failures alike
+def report_errors(errors, viz_dir, append=False):
+
+    for data_path, error in errors:
+        print(f"Failed on {os.path.basename(data_path)}: {error.strip().splitlines()[-1]}")
+
+    with open(os.path.join(viz_dir, 'errors.txt'), 'a' if append else 'w') as f:
+        for data_path, error in errors:
+            f.write(f"{data_path}\n{error}\n")
+
+# render the new or changed sessions for one day and record them in the manifest, returns the recorded entries
+# when store_dir is set the rendered sessions are also ingested into the columnar session store
+# stage metrics of every rendered session are appended to the day's metrics file, and the
+# profile_n slowest sessions are profiled with cProfile
+def render_day(date_str, manifest, workers=default_workers, force=False, store_dir=None, profile_n=0):
+    data_dir, viz_dir = day_dirs(date_str)
+
+    # check if the data directory exists and has CSV files
+    if not (os.path.exists(data_dir) and any(fname.endswith('.csv') for fname in os.listdir(data_dir))):
+        print(f"No CSV files found in {data_dir} for the date {date_str}.")
+        return {}
 
-# check if the data directory exists and has CSV files
-if os.path.exists(data_dir) and any(fname.endswith('.csv') for fname in os.listdir(data_dir)):
-    
     # ensure visualization directory exists
     os.makedirs(viz_dir, exist_ok=True)
 
-    # process each CSV file in the data directory
-    for filename in os.listdir(data_dir):
-
-        if filename.endswith(".csv"):
-
-            # create path for data
-            data_path = os.path.join(data_dir, filename)
-
-            # read in csv
-            df = pd.read_csv(data_path)
-
-            # condense df, groupby tagged pitch type, calculate mean pitch metrics
-            df_condensed = df[['TaggedPitchType', 'RelSpeed', 'InducedVertBreak', 'HorzBreak']]
-            df_condensed = df_condensed.dropna(subset=['TaggedPitchType'])
-            grouped_df = df_condensed.groupby(['TaggedPitchType']).mean()
-
-            # convert name from Last, First to First Last
-            def format_name(name):
-                parts = name.split(", ")
-                if len(parts) == 2:
-                    return f"{parts[1]} {parts[0]}"
-                return name
-
-            pitcher_name = df.loc[0, 'Pitcher']
-            session_date = df.loc[0, 'Date']
-
-            formatted_name = "_".join(pitcher_name.split(", ")[::-1]).replace(" ", "_")
-
-            # convert date formats to yyyy_mm_dd format for file path
-            def parse_date(date_str):
-                for fmt in ("%m/%d/%Y", "%m-%d-%Y", "%Y-%m-%d"):  # Add more formats if needed
-                    try:
-                        return datetime.datetime.strptime(date_str, fmt).strftime("%Y_%m_%d")
-                    except ValueError:
-                        pass
-                raise ValueError(f"Date format for '{date_str}' is not supported")
-
-            formatted_date = parse_date(df.loc[0, 'Date'])
-            
-            # create standard color map by pitch type for plot
-            pitch_types = df_condensed['TaggedPitchType'].unique()
-            colors = plt.cm.get_cmap('Dark2', len(pitch_types))
-            color_map = {pitch_type: colors(i) for i, pitch_type in enumerate(pitch_types)}
-
-            # get number of unique pitch types
-            unique_pitch_types = len(grouped_df['RelSpeed'].unique())
-
-            # initialize plot
-            fig, ax = plt.subplots(figsize=(10, 6))
-
-            # plot for each pitch type
-            for pitch_type in pitch_types:
-
-                subset = df_condensed[df_condensed['TaggedPitchType'] == pitch_type]
-                ax.scatter(subset['HorzBreak'], subset['InducedVertBreak'], color=color_map[pitch_type], s=50, alpha=0.25, edgecolor='none')
-                
-                if pitch_type in grouped_df.index:
-
-                    # plot average pitch
-                    avg_horz_break = grouped_df.loc[pitch_type, 'HorzBreak']
-                    avg_vert_break = grouped_df.loc[pitch_type, 'InducedVertBreak']
-                    ax.scatter(avg_horz_break, avg_vert_break, color=color_map[pitch_type], s=50, label=pitch_type, alpha=1.0)
-                    rounded_rel_speed = round(grouped_df.loc[pitch_type, 'RelSpeed'], 1)
-                    ax.text(avg_horz_break + 0.5, avg_vert_break + 0.5, f"{rounded_rel_speed}", fontsize=8, va='center')
-
-            # plot formatting
-            plt.xlabel('Horizontal Break (in)')
-            plt.ylabel('Induced Vertical Break (in)')
-            plt.grid(which='major', linestyle=':', linewidth='0.5', color='gray')
-            plt.axhline(0, color='black', linewidth=2)
-            plt.axvline(0, color='black', linewidth=2)
-            ax.spines['right'].set_visible(False)
-            ax.spines['top'].set_visible(False)
-            ax.set_xlim(-24, 24)
-            ax.set_ylim(-24, 24)
-            ax.set_title(f"{format_name(df['Pitcher'].iloc[0])} - {df['Date'].iloc[0]}", loc='left')
-            plt.legend(loc='upper center', bbox_to_anchor=(0.5, -0.10), ncols=unique_pitch_types, frameon=False)
-
-            # create file name using formatted name and date
-            file_name = f"{formatted_name}_{formatted_date}.png"
-
-            # save fig to specific directory using file name
-            plt.savefig(os.path.join(viz_dir, file_name), bbox_inches='tight', pad_inches=0.3)
-
-    print("Visualizations created.")
-
-else:
-
-    print(f"No CSV files found in {data_dir} for the date {date_str}.")
+    # hash each CSV file in the data directory and keep only the new or modified ones
+    data_paths = [os.path.join(data_dir, filename) for filename in sorted(os.listdir(data_dir)) if filename.endswith(".csv")]
+    hashes = {}
+    for data_path in data_paths:
+        content_hash = file_hash(data_path)
+        if force or not is_current(manifest.get(data_path), content_hash):
+            hashes[data_path] = content_hash
+
+    skipped = len(data_paths) - len(hashes)
+    run_started = datetime.datetime.now().isoformat(timespec='seconds')
+    rendered, errors = render_all(list(hashes), viz_dir, workers=workers)
+
+    # a csv the store cannot ingest is reported with the render failures and left out of the manifest,
+    # so the next run tries it again, the rest of the day carries on
+    entries = {}
+    for data_path, output_path, stages in rendered:
+        if store_dir:
+            try:
+                ingest_csv(data_path, store_dir)
+            except Exception:
+                errors.append((data_path, traceback.format_exc()))
+                continue
+        entries[data_path] = {'hash': hashes[data_path], 'output': output_path, 'plot_version': plot_version}
+        manifest[data_path] = entries[data_path]
+
+    append_jsonl(os.path.join(viz_dir, metrics_filename),
+                 [metrics_record(run_started, data_path, stages) for data_path, output_path, stages in rendered])
+
+    if profile_n:
+        profile_slowest(rendered, viz_dir, profile_n)
+
+    if errors:
+        report_errors(errors, viz_dir)
+
+    print(f"Visualizations created for {date_str}: {len(rendered)} rendered, {skipped} unchanged, {len(errors)} failed.")
+    return entries
+
+def main():
+    parser = argparse.ArgumentParser(description="Render pitch movement plots for a day of TrackMan sessions.")
+    parser.add_argument('--workers', type=int, default=default_workers, help="number of worker processes, 1 renders serially")
+    parser.add_argument('--start', type=datetime.date.fromisoformat, default=yesterday, help="first date to render, YYYY-MM-DD (default yesterday)")
+    parser.add_argument('--end', type=datetime.date.fromisoformat, default=None, help="last date to render, YYYY-MM-DD (default the start date)")
+    parser.add_argument('--force', action='store_true', help="render every session even if it is unchanged")
+    parser.add_argument('--store', default=None, help="session store folder to ingest rendered sessions into")
+    parser.add_argument('--profile', type=int, default=0, metavar='N', help="save cProfile stats for the N slowest sessions of each day")
+    args = parser.parse_args()
+
+    end = args.end or args.start
+    manifest = load_manifest()
+
+    # save after each day so a backfill that is interrupted keeps the work already done,
+    # merged into the manifest on disk so sessions trackman_watch.py recorded meanwhile are kept
+    for date_str in date_range(args.start, end):
+        entries = render_day(date_str, manifest, workers=args.workers, force=args.force, store_dir=args.store, profile_n=args.profile)
+        manifest = update_manifest(entries)
+
+if __name__ == '__main__':
+    main()
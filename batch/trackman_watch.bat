@@ -0,0 +1,8 @@
+@echo off
+setlocal
+
+rem set path to the Python executable in the Conda environment
+set PYTHON_EXE=**PATH TO PYTHON EXECUTABLE ENVIRONMENT**
+
+rem run the watcher using the Python executable in the Conda environment
+"%PYTHON_EXE%" **PATH TO FILE**\trackman_watch.py
@@ -0,0 +1,187 @@
+import os
+import time
+import datetime
+import argparse
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import trackman_viz
+import matplotlib.pyplot as plt
+from trackman_viz import render_session, day_dirs, file_hash, is_current, load_manifest, update_manifest, report_errors, metrics_record
+from session_store import ingest_csv
+from stage_metrics import append_jsonl
+
+# seconds between scans of the data folder
+poll_interval = 2.0
+
+# seconds a csv must keep the same size and modification time before it is rendered,
+# so files that are still being written by the download are left alone
+debounce = 5.0
+
+# default number of worker processes
+default_workers = max(1, min(4, os.cpu_count() or 1))
+
+# run once in each worker so matplotlib, the font cache and pandas are loaded before the first session arrives
+def warm_up():
+    fig = plt.figure()
+    fig.canvas.draw()
+    plt.close(fig)
+
+# csv files in the YYYY-MM-DD folders of the data root, with their size and modification time
+def scan(data_root):
+    found = {}
+    for day in os.scandir(data_root):
+        if not day.is_dir():
+            continue
+        for entry in os.scandir(day.path):
+            if entry.is_file() and entry.name.endswith(".csv"):
+                stat = entry.stat()
+                found[entry.path] = (day.name, stat.st_size, stat.st_mtime_ns)
+    return found
+
+class SessionWatcher:
+
+    def __init__(self, data_root, workers=default_workers, store_dir=None):
+        self.data_root = data_root
+        self.workers = workers
+        self.store_dir = store_dir
+        self.manifest = load_manifest()
+
+        # at most this many sessions are queued in the pool, the rest wait for the next scan
+        self.max_pending = workers * 2
+
+        # path -> (size, mtime, time the file was first seen with that size and mtime)
+        self.seen = {}
+
+        # path -> (future, content hash, viz folder, time the session was queued)
+        self.pending = {}
+
+        # path -> (size, mtime) of the version already rendered, skipped or failed, so settled files
+        # are hashed once rather than on every scan and failures are retried only once the file changes
+        self.handled = {}
+
+        # (path, content hash, viz folder, time queued) of the sessions queued in a pool that broke,
+        # run again one at a time so the session that kills its worker is found
+        self.suspects = []
+
+        self.executor = ProcessPoolExecutor(max_workers=workers, initializer=warm_up)
+
+    # a worker that dies (killed, out of memory, a crash in native code) breaks the whole pool: start a new pool
+    # a session that was alone in the broken pool killed it and is reported as failed, the sessions of a pool
+    # that had several are queued again to run one at a time
+    def restart_pool(self):
+        print("A worker process died, restarting the pool.")
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=warm_up)
+
+        if len(self.pending) == 1:
+            data_path, (future, content_hash, viz_dir, queued) = self.pending.popitem()
+            report_errors([(data_path, "BrokenProcessPool: the worker rendering this session died\n")], viz_dir, append=True)
+        else:
+            self.suspects.extend((data_path, content_hash, viz_dir, queued)
+                                 for data_path, (future, content_hash, viz_dir, queued) in self.pending.items())
+            self.pending.clear()
+
+    # queue the csvs that have settled and are not already rendered
+    def poll(self):
+        now = time.monotonic()
+
+        # after a broken pool its sessions run alone, new files wait until they are all done
+        if self.suspects:
+            if not self.pending:
+                data_path, content_hash, viz_dir, queued = self.suspects.pop(0)
+                self.pending[data_path] = (self.executor.submit(render_session, data_path, viz_dir), content_hash, viz_dir, queued)
+            return
+
+        for data_path, (date_str, size, mtime) in scan(self.data_root).items():
+            previous = self.seen.get(data_path)
+            if previous is None or previous[:2] != (size, mtime):
+                self.seen[data_path] = (size, mtime, now)
+                continue
+
+            if data_path in self.pending or self.handled.get(data_path) == (size, mtime) or now - previous[2] < debounce:
+                continue
+
+            if len(self.pending) >= self.max_pending:
+                break
+
+            self.handled[data_path] = (size, mtime)
+            content_hash = file_hash(data_path)
+            if is_current(self.manifest.get(data_path), content_hash):
+                continue
+
+            viz_dir = day_dirs(date_str)[1]
+            os.makedirs(viz_dir, exist_ok=True)
+            try:
+                future = self.executor.submit(render_session, data_path, viz_dir)
+            except BrokenProcessPool:
+                self.restart_pool()
+                self.suspects.append((data_path, content_hash, viz_dir, now))
+                break
+            self.pending[data_path] = (future, content_hash, viz_dir, now)
+
+    # record finished sessions in the manifest and their stage metrics, and report failures
+    # sessions of a broken pool stay pending and are queued again in a new pool unless restart is False
+    def collect(self, restart=True):
+        entries = {}
+        broken = False
+
+        for data_path, (future, content_hash, viz_dir, queued) in list(self.pending.items()):
+            if not future.done():
+                continue
+
+            try:
+                output_path, stages = future.result()
+            except BrokenProcessPool:
+                broken = True
+                continue
+            except Exception:
+                del self.pending[data_path]
+                report_errors([(data_path, traceback.format_exc())], viz_dir, append=True)
+                continue
+            del self.pending[data_path]
+
+            run_started = datetime.datetime.now().isoformat(timespec='seconds')
+            append_jsonl(os.path.join(viz_dir, trackman_viz.metrics_filename), [metrics_record(run_started, data_path, stages)])
+
+            # a csv the store cannot ingest is reported like a failed render and left out of the manifest
+            if self.store_dir:
+                try:
+                    ingest_csv(data_path, self.store_dir)
+                except Exception:
+                    report_errors([(data_path, traceback.format_exc())], viz_dir, append=True)
+                    continue
+
+            entries[data_path] = {'hash': content_hash, 'output': output_path, 'plot_version': trackman_viz.plot_version}
+            print(f"Rendered {os.path.basename(output_path)} in {time.monotonic() - queued:.1f}s")
+
+        # merged into the manifest on disk, which the nightly trackman_viz.py run also writes
+        if entries:
+            self.manifest = update_manifest(entries)
+
+        if broken and restart:
+            self.restart_pool()
+
+    def run(self):
+        print(f"Watching {self.data_root} for new sessions.")
+        try:
+            while True:
+                self.poll()
+                self.collect()
+                time.sleep(poll_interval)
+        except KeyboardInterrupt:
+            print("Stopping, waiting for queued sessions to finish.")
+        finally:
+            self.executor.shutdown(wait=True)
+            self.collect(restart=False)
+
+def main():
+    parser = argparse.ArgumentParser(description="Render TrackMan sessions as soon as they are downloaded.")
+    parser.add_argument('--workers', type=int, default=default_workers, help="number of worker processes")
+    parser.add_argument('--store', default=None, help="session store folder to ingest rendered sessions into")
+    args = parser.parse_args()
+
+    SessionWatcher(trackman_viz.data_root, workers=args.workers, store_dir=args.store).run()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+# shared statcast modules live one folder up
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from statcast_cache import statcast_range, date_range
+from framing_metrics import threshold
+from strike_model import model_path, load_model, score
+from framing_model import ids_path, add_catcher_names, leaderboard_tables, save_leaderboards
+
+# running totals of the season, one row per game day and catcher
+totals_path = 'Framing_Daily_Totals.csv'
+
+# a row of the running totals is one catcher on one day, the catcher's name can be missing from mlb_ids.csv
+total_keys = ['game_date', 'fielder_2', 'mlb_name']
+
+# every framing number is a sum over pitches, so the leaderboard of any set of days is the sum of their rows:
+# called pitches (the qualification count), sum and count of delta_run_exp of called strikes and of balls (the
+# run values), and the marginal pitches, their strike probability added, and its absolute value on called strikes
+# and on balls (the framing runs, valued once the season's run values are known)
+total_columns = ['called', 'strike_runs', 'strike_runs_n', 'ball_runs', 'ball_runs_n',
+                 'marg_pitches', 'marg_strikes_gained', 'marg_strike_abs', 'marg_ball_abs']
+
+# running totals of scored pitches with catcher names, as rows of total_keys and total_columns
+def daily_totals(df):
+    called = df[df['description'].isin(['called_strike', 'ball'])]
+    strike = (called['description'] == 'called_strike').to_numpy()
+    spa = called['strike_prob_added'].to_numpy(dtype='float64')
+    runs = called['delta_run_exp'].to_numpy(dtype='float64')
+    marginal = np.where(strike, called['strike_probability'] < 0.5, called['strike_probability'] > 0.5)
+
+    values = pd.DataFrame({
+        'called': 1,
+        'strike_runs': np.where(strike, np.nan_to_num(runs), 0),
+        'strike_runs_n': strike & ~np.isnan(runs),
+        'ball_runs': np.where(~strike, np.nan_to_num(runs), 0),
+        'ball_runs_n': ~strike & ~np.isnan(runs),
+        'marg_pitches': marginal,
+        'marg_strikes_gained': np.where(marginal, spa, 0),
+        'marg_strike_abs': np.where(marginal & strike, np.abs(spa), 0),
+        'marg_ball_abs': np.where(marginal & ~strike, np.abs(spa), 0),
+    }, index=called.index)
+
+    game_date = pd.to_datetime(called['game_date']).dt.strftime("%Y-%m-%d")
+    keys = [game_date, called['fielder_2'], called['mlb_name']]
+    return values.groupby(keys, dropna=False).sum().reset_index()[total_keys + total_columns]
+
+def load_totals(path=totals_path):
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=total_keys + total_columns)
+    return pd.read_csv(path, dtype={'game_date': str})
+
+# merge new days into the running totals, days already in the totals are replaced so a day can be added again
+def merge_totals(totals, new):
+    kept = totals[~totals['game_date'].isin(new['game_date'])]
+    parts = [part for part in [kept, new] if len(part)]
+    if not parts:
+        return totals
+    return pd.concat(parts, ignore_index=True).sort_values(['game_date', 'fielder_2'], ignore_index=True)
+
+# written under a temporary name first so the dashboard or another update never reads a partial file
+def save_totals(totals, path=totals_path):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    totals.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+# per catcher framing metrics and the mean strike probability added of all marginal pitches, from the running
+# totals alone, the same numbers framing_metrics gives for the qualified catchers' marginal pitches
+def totals_metrics(totals, threshold=threshold):
+    season = totals[total_columns].sum()
+    called_strike_val = season['strike_runs'] / season['strike_runs_n']
+    called_ball_val = season['ball_runs'] / season['ball_runs_n']
+
+    catchers = totals.groupby('mlb_name')[total_columns].sum()
+    catchers = catchers[(catchers['called'] > threshold) & (catchers['marg_pitches'] > 0)]
+
+    metrics = pd.DataFrame({
+        'pitches': catchers['marg_pitches'].astype(int),
+        'strikes_gained': catchers['marg_strikes_gained'],
+        'cfr_marg': catchers['marg_strike_abs'] * called_strike_val + catchers['marg_ball_abs'] * called_ball_val,
+    })
+    marginal_mean = metrics['strikes_gained'].sum() / metrics['pitches'].sum()
+    metrics['avg_spg'] = metrics['strikes_gained'] / metrics['pitches']
+    metrics['avg_sg_marg_rel'] = metrics['avg_spg'] - marginal_mean
+    return metrics.reset_index(), marginal_mean
+
+# score the days of a date range from the statcast cache and add them to the running totals
+def update_totals(start, end, totals_path=totals_path, model_path=model_path, ids_path=ids_path):
+    model = load_model(model_path)
+    days = [add_catcher_names(score(df.reset_index(drop=True), model), ids_path)
+            for df in (statcast_range(date_str, date_str) for date_str in date_range(start, end)) if len(df)]
+    totals = load_totals(totals_path)
+    if not days:
+        return totals
+    totals = merge_totals(totals, daily_totals(pd.concat(days, ignore_index=True)))
+    save_totals(totals, totals_path)
+    return totals
+
+def main():
+    parser = argparse.ArgumentParser(description="Add game days to the running framing totals and rebuild the leaderboards from them.")
+    parser.add_argument('start', nargs='?', default=None, help="first date to add, YYYY-MM-DD (none only rebuilds the leaderboards)")
+    parser.add_argument('end', nargs='?', default=None, help="last date to add (default the start date)")
+    parser.add_argument('--pitches', default=None, help="start the totals from a scored pitch csv written by framing_model.py instead")
+    parser.add_argument('--totals', default=totals_path, help="running totals csv")
+    parser.add_argument('--model', default=model_path, help="saved model file")
+    parser.add_argument('--ids', default=ids_path, help="csv of player names and MLB IDs")
+    parser.add_argument('--threshold', type=int, default=threshold, help="called pitches a catcher needs to qualify")
+    parser.add_argument('--output-dir', default='.', help="folder to write the leaderboard csvs into")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+
+    if args.pitches:
+        totals = daily_totals(pd.read_csv(args.pitches, index_col=0))
+        save_totals(totals, args.totals)
+    elif args.start:
+        totals = update_totals(args.start, args.end or args.start, args.totals, args.model, args.ids)
+    else:
+        totals = load_totals(args.totals)
+
+    catcher_metrics, marginal_mean = totals_metrics(totals, args.threshold)
+    save_leaderboards(*leaderboard_tables(catcher_metrics, marginal_mean), args.output_dir)
+    print(f"Leaderboards of {len(catcher_metrics)} catchers over {totals['game_date'].nunique()} days written in {time.perf_counter() - started:.1f}s.")
+
+if __name__ == '__main__':
+    main()
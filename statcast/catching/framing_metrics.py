@@ -0,0 +1,158 @@
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+# qualified catcher threshold: 6 called pitches per game
+threshold = 6*162
+
+# groupings of the framing splits, by name
+splits = {
+    'catcher': ['mlb_name'],
+    'battery': ['mlb_name', 'player_name'],
+    'team': ['fld_team'],
+    'month': ['month'],
+    'count': ['count'],
+    'catcher_count': ['mlb_name', 'count'],
+}
+
+# dimensions that are not statcast columns, derived from the statcast columns when they are grouped by
+
+# fielding team: the home team fields in the top of the inning
+def fld_team(df):
+    return pd.Series(np.where(df['inning_topbot'] == 'Top', df['home_team'], df['away_team']), index=df.index)
+
+def month(df):
+    return pd.to_datetime(df['game_date']).dt.strftime("%Y-%m")
+
+def count(df):
+    return df['balls'].astype(str) + '-' + df['strikes'].astype(str)
+
+derived_dimensions = {'fld_team': fld_team, 'month': month, 'count': count}
+
+# bootstrap confidence intervals: resamples per task sent to the process pool, default pool size and interval level
+bootstrap_batch = 25
+default_workers = os.cpu_count() or 1
+ci_level = 0.95
+
+# average run value of a called strike and of a called ball over every pitch of the season
+def run_values(df):
+    values = df.loc[df['description'].isin(['called_strike', 'ball'])].groupby('description')['delta_run_exp'].mean()
+    return values['called_strike'], values['ball']
+
+# called pitches of catchers with more than threshold of them, kept only where the call went against the model:
+# called strikes with strike probability under 0.5 and balls over 0.5
+def marginal_pitches(df, threshold=threshold):
+    called = df.loc[df['description'].isin(['called_strike', 'ball'])]
+    called = called[called.groupby('mlb_name')['mlb_name'].transform('size') > threshold]
+    return called[((called['description'] == 'called_strike') & (called['strike_probability'] < 0.5)) |
+                  ((called['description'] == 'ball') & (called['strike_probability'] > 0.5))]
+
+# every framing metric of marginal pitches per group, in one grouped pass over precomputed pitch values:
+# pitches, strikes gained, average strike probability added and its difference to the mean of all marginal
+# pitches, and catcher framing runs (strike probability added valued at the average called strike or ball)
+# by may mix statcast columns and the derived dimensions, returns one row per group
+def framing_metrics(df, by, called_strike_val, called_ball_val):
+    values = pitch_values(df, called_strike_val, called_ball_val)
+
+    metrics = values.groupby(group_keys(df, by), observed=True).sum()
+    metrics['avg_spg'] = metrics['strikes_gained'] / metrics['pitches']
+    metrics['avg_sg_marg_rel'] = metrics['avg_spg'] - values['strikes_gained'].mean()
+    return metrics.reset_index()
+
+# the per pitch values framing metrics are sums of: 1, strike probability added and framing runs
+def pitch_values(df, called_strike_val, called_ball_val):
+    spa = df['strike_prob_added'].to_numpy(dtype='float64')
+    strike = (df['description'] == 'called_strike').to_numpy()
+    return pd.DataFrame({
+        'pitches': 1,
+        'strikes_gained': spa,
+        'cfr_marg': np.abs(spa) * np.where(strike, called_strike_val, called_ball_val),
+    }, index=df.index)
+
+# groupby keys of by, statcast columns or derived dimensions
+# a column with no values at all (e.g. umpire, which Baseball Savant leaves empty) would give an empty split, so it is an error
+def group_keys(df, by):
+    keys = [derived_dimensions[col](df).rename(col) if col not in df.columns else df[col] for col in by]
+    empty = [key.name for key in keys if len(key) and key.isna().all()]
+    if empty:
+        raise ValueError(f"{', '.join(empty)} has no values in these pitches, the split would be empty")
+    return keys
+
+# strikes gained, framing runs and avg strike probability added relative to the mean of n resamples, as an
+# (n, 3, groups) array. pitches are sorted by group, starting at starts, and every group is resampled with
+# replacement to its own size: one array of random row positions per resample, summed per group with reduceat
+def resample_metrics(spa, cfr, starts, sizes, seed, n):
+    rng = np.random.default_rng(seed)
+    total = len(spa)
+    owner_start = np.repeat(starts, sizes)
+    owner_size = np.repeat(sizes, sizes)
+
+    rows = owner_start + (rng.random((n, total)) * owner_size).astype(np.intp)
+    strikes_gained = np.add.reduceat(spa[rows], starts, axis=1)
+    cfr_marg = np.add.reduceat(cfr[rows], starts, axis=1)
+    avg_rel = strikes_gained / sizes - strikes_gained.sum(axis=1, keepdims=True) / total
+    return np.stack([strikes_gained, cfr_marg, avg_rel], axis=1)
+
+# framing_metrics with bootstrap confidence intervals (metric_lo, metric_hi) of strikes gained, framing runs and
+# avg strike probability added relative to the mean, from n_resamples resamples of each group's pitches
+# resamples are drawn in batches across a process pool, each batch seeded from one SeedSequence, so the
+# intervals are the same for a seed whatever the number of workers
+def bootstrap_metrics(df, by, called_strike_val, called_ball_val, n_resamples=1000, workers=default_workers, seed=0, level=ci_level):
+    metrics = framing_metrics(df, by, called_strike_val, called_ball_val)
+    values = pitch_values(df, called_strike_val, called_ball_val)
+
+    # pitches sorted by their row in metrics, pitches without a group are left out
+    codes = values.groupby(group_keys(df, by), observed=True).ngroup().to_numpy()
+    order = np.argsort(codes, kind='stable')[np.count_nonzero(codes < 0):]
+    sizes = np.bincount(codes[order], minlength=len(metrics))
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    spa = values['strikes_gained'].to_numpy()[order]
+    cfr = values['cfr_marg'].to_numpy()[order]
+
+    batches = [min(bootstrap_batch, n_resamples - first) for first in range(0, n_resamples, bootstrap_batch)]
+    seeds = np.random.SeedSequence(seed).spawn(len(batches))
+    if workers <= 1:
+        samples = [resample_metrics(spa, cfr, starts, sizes, s, n) for s, n in zip(seeds, batches)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            samples = list(executor.map(resample_metrics, [spa] * len(batches), [cfr] * len(batches), [starts] * len(batches),
+                                        [sizes] * len(batches), seeds, batches))
+
+    low, high = np.quantile(np.concatenate(samples), [(1 - level) / 2, (1 + level) / 2], axis=0)
+    for i, metric in enumerate(['strikes_gained', 'cfr_marg', 'avg_sg_marg_rel']):
+        metrics[f"{metric}_lo"] = low[i]
+        metrics[f"{metric}_hi"] = high[i]
+    return metrics
+
+def main():
+    parser = argparse.ArgumentParser(description="Catcher framing metrics split by any grouping, from the pitches scored by framing_model.py.")
+    parser.add_argument('pitches', nargs='?', default='2023_Catcher_Name_and_SP.csv', help="scored pitch csv written by framing_model.py")
+    parser.add_argument('--split', default='catcher', help=f"comma separated splits ({', '.join(splits)}) or statcast columns joined by +")
+    parser.add_argument('--threshold', type=int, default=threshold, help="called pitches a catcher needs to qualify")
+    parser.add_argument('--output-dir', default='.', help="folder to write one csv per split into")
+    parser.add_argument('--bootstrap', type=int, default=0, metavar='N', help="add confidence intervals from N bootstrap resamples")
+    parser.add_argument('--workers', type=int, default=default_workers, help="worker processes for the bootstrap")
+    parser.add_argument('--seed', type=int, default=0, help="bootstrap seed")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.pitches, index_col=0)
+    called_strike_val, called_ball_val = run_values(df)
+    marginal = marginal_pitches(df, args.threshold)
+
+    for split in args.split.split(','):
+        by = splits.get(split, split.split('+'))
+        try:
+            if args.bootstrap:
+                metrics = bootstrap_metrics(marginal, by, called_strike_val, called_ball_val, args.bootstrap, args.workers, args.seed)
+            else:
+                metrics = framing_metrics(marginal, by, called_strike_val, called_ball_val)
+        except ValueError as e:
+            parser.error(f"{split}: {e}")
+        output_path = os.path.join(args.output_dir, f"Framing_{split.replace('+', '_')}.csv")
+        metrics.round(4).to_csv(output_path, index=False)
+        print(f"{len(metrics)} {split} rows written to {output_path}.")
+
+if __name__ == '__main__':
+    main()
@@ -1,205 +1,204 @@
+import os
+import sys
+import argparse
 import xgboost as xgb
-import numpy as np
 import matplotlib.pyplot as plt
 import pandas as pd
-from sklearn.model_selection import train_test_split
-import mysql.connector
-import pybaseball
-from sklearn.metrics import accuracy_score, log_loss
-
-# pull statcast data for the 2022 season to train the model on
-df1 = pybaseball.statcast(start_dt='2022-03-30', end_dt='2022-04-30')
-df2 = pybaseball.statcast(start_dt='2022-05-01', end_dt='2022-05-31')
-df3 = pybaseball.statcast(start_dt='2022-06-01', end_dt='2022-06-30')
-df4 = pybaseball.statcast(start_dt='2022-07-01', end_dt='2022-07-31')
-df5 = pybaseball.statcast(start_dt='2022-08-01', end_dt='2022-08-31')
-df6 = pybaseball.statcast(start_dt='2022-09-01', end_dt='2022-09-30')
-df7 = pybaseball.statcast(start_dt='2022-10-01', end_dt='2022-11-01')
-
-# combine dfs and save as csv
-df = pd.concat([df1, df2, df3, df4, df5, df6, df7])
-df.to_csv('2022_MLB_Season.csv')
-
-# convert pitcher and batter handedness columns to binary
-df['p_throws'] = df['p_throws'].map({'L': 0, 'R': 1})
-df['stand'] = df['stand'].map({'L': 0, 'R': 1})
-
-# select only called balls and strikes and convert to binary
-df = df[df['description'].isin(['called_strike', 'ball'])]
-df['description'] = df['description'].map({'ball': 0, 'called_strike': 1})
-
-# feature selection and data splitting
-features = ['stand', 'p_throws', 'balls', 'strikes', 'plate_x', 'plate_z', 'sz_top', 'sz_bot']
-
-# create features and targets
-X = df[features]
-y = df['description']
-
-# train valid test split
-X_train, X_temp, y_train, y_temp = train_test_split(X, y, test_size=0.2, random_state=42)
-X_valid, X_test, y_valid, y_test = train_test_split(X_temp, y_temp, test_size=0.5, random_state=42)
-
-# set up xgboost regression model
-dtrain = xgb.DMatrix(X_train, label=y_train)
-dvalid = xgb.DMatrix(X_valid, label=y_valid)
-
-# identfiy parameters
-params = {
-    'max_depth': 6,
-    'eta': 0.3,
-    'objective': 'binary:logistic',
-    'eval_metric': 'logloss'
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# shared statcast modules live one folder up
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from statcast_cache import statcast_range
+from framing_metrics import threshold, run_values, marginal_pitches, framing_metrics, bootstrap_metrics
+from strike_model import model_path, train_model, save_model, load_model, score
+
+# 2022 season to train the model on, 2023 season to score
+train_start, train_end = '2022-03-30', '2022-11-01'
+score_start, score_end = '2023-03-30', '2023-10-20'
+
+# name and MLB ID of every active player
+ids_path = 'mlb_ids.csv'
+
+# marginal pitches of every catcher with only the columns framing_dash.py uses, memory mapped by the dashboard at startup:
+# names, teams and calls as categories, coordinates and probabilities as float32, in an uncompressed feather file
+dash_pitches_path = '2023_Framing_Dash_Pitches.feather'
+dash_dtypes = {
+    'mlb_name': 'category',
+    'game_date': 'str',
+    'home_team': 'category',
+    'away_team': 'category',
+    'description': 'category',
+    'plate_x': 'float32',
+    'plate_z': 'float32',
+    'sz_top': 'float32',
+    'sz_bot': 'float32',
+    'strike_probability': 'float32',
+    'strike_prob_added': 'float32',
 }
+dash_columns = list(dash_dtypes)
 
-# train model
-evallist = [(dvalid, 'eval'), (dtrain, 'train')]
-num_round = 50
-bst = xgb.train(params, dtrain, num_round, evallist)
+# train the strike probability model on the 2022 season, save it with its features and plot feature importance
+def train(path=model_path):
 
-# predict values
-y_pred_prob = bst.predict(dvalid)
-y_pred = [1 if p > 0.5 else 0 for p in y_pred_prob]
+    # pull statcast data for the 2022 season, only days missing from the local cache are downloaded
+    df = statcast_range(train_start, train_end)
 
-# calculate validation accuracy
-accuracy = accuracy_score(y_valid, y_pred)
-print(f"Validation Accuracy: {accuracy * 100:.2f}%")
+    bst = train_model(df)
+    save_model(bst, path, train_start=train_start, train_end=train_end)
 
-# calculate validation log loss
-log_loss_value = log_loss(y_valid, y_pred_prob)
-print(f"Validation Log Loss: {log_loss_value:.4f}")
+    # feature importance analysis
+    importance = bst.get_score(importance_type='gain')
 
-#Validation Accuracy: 93.31%
-#Validation Log Loss: 0.1559
+    # plot feature importance
+    xgb.plot_importance(importance)
 
-# train on valididation and training set combined
-dtrain_full = xgb.DMatrix(pd.concat([X_train, X_valid]), label=pd.concat([y_train, y_valid]))
+    # save fig as png
+    plt.savefig('Strike_Prob_Model_Feature_Importance.png')
 
-# retrain the model
-bst = xgb.train(params, dtrain_full, num_boost_round=100)
+    plt.show()
 
-# feature importance analysis
-importance = bst.get_score(importance_type='gain')
+# 2023 pitches with strike probabilities and catcher names
+def score_season(model):
 
-# plot feature importance
-xgb.plot_importance(importance)
+    # load in current season's data, from the same cache run_exp_matrix.py fills
+    df_2023 = score(statcast_range(score_start, score_end), model)
 
-# save fig as png
-plt.savefig('Strike_Prob_Model_Feature_Importance.png')
+    df_2023.to_csv('2023_MLB_w_strike_probs.csv')
 
-plt.show()
+    return add_catcher_names(df_2023)
 
-# load in current season's data
-df_2023 = pd.read_csv('2023_MLB_Season.csv')
+# scored pitches in game order with the catcher's name and MLB ID
+def add_catcher_names(df, path=ids_path):
 
-# select features
-df_features = df_2023[features]
+    # I used mysqlconnector with a private database to pull MLB IDs, but those are publically available online as well
 
-# make pitcher and hitter handedness columns binary
-df_features['p_throws'] = df_features['p_throws'].map({'L': 0, 'R': 1})
-df_features['stand'] = df_features['stand'].map({'L': 0, 'R': 1})
+    # theoretical df that has name and MLB ID for all active players
+    ids = pd.read_csv(path)
 
-# convert df to xgboost dmatrix
-d2023 = xgb.DMatrix(df_features)
+    # ensure df is sequential
+    df = df.sort_values(by=['game_pk', 'inning', 'at_bat_number', 'pitch_number'])
 
-# predict strike probabilities
-strike_probabilities = bst.predict(d2023)
+    # pair player ids with player names
+    df = df.merge(ids, left_on='fielder_2', right_on='mlb_id', how='left')
 
-# apply strike probabilities to df
-df_2023['strike_probability'] = strike_probabilities
+    # resolve 4 ball count mistake
+    df.loc[df['balls'] == 4, 'balls'] = 3
 
-# calculate strike probability added for each pitch
-df_2023['strike_prob_added'] = np.where(df_2023['description'] == 'called_strike', 
-                                            1 - df_2023['strike_probability'], 
-                                            np.where(df_2023['description'] == 'ball', 
-                                                     0 - df_2023['strike_probability'], 0))
+    return df
 
-df_2023.to_csv('2023_MLB_w_strike_probs.csv')
+# strikes gained, avg strike probability added relative to the mean and catcher framing runs on marginal pitches
+# per catcher over 2023, in one grouped pass (framing_metrics.py has the other splits)
+def leaderboards(df_2023, threshold=threshold):
 
-# I used mysqlconnector with a private database to pull MLB IDs, but those are publically available online as well
+    # called strikes and balls of qualified catchers (6 per game) where the call went against the model
+    df_qualified = marginal_pitches(df_2023, threshold)
 
-# theoretical df that has name and MLB ID for all active players
-ids = pd.read_csv('mlb_ids.csv')
+    # calculate avg value of a ball and strike
+    called_strike_val, called_ball_val = run_values(df_2023)
 
-# ensure df is sequential
-df_2023.sort_values(by=['game_pk', 'inning', 'at_bat_number', 'pitch_number'], inplace=True)
+    catcher_metrics = framing_metrics(df_qualified, ['mlb_name'], called_strike_val, called_ball_val)
 
-# pair player ids with player names
-df_2023 = df_2023.merge(ids, left_on='fielder_2', right_on='mlb_id', how='left')
+    return leaderboard_tables(catcher_metrics, df_qualified['strike_prob_added'].mean())
 
-# resolve 4 ball count mistake
-df_2023.loc[df_2023['balls'] == 4, 'balls'] = 3
+# the three leaderboards from per catcher framing metrics and the mean strike probability added of all marginal
+# pitches, printed and returned as (sum_df, mean_df, cfr_marg_df); framing_daily.py builds them from running totals
+def leaderboard_tables(catcher_metrics, marginal_mean):
 
-# filter only called strikes and balls
-df_filtered = df_2023.loc[df_2023['description'].isin(['called_strike', 'ball'])]
+    # strikes gained per catcher over the 2023 season
+    sum_df = catcher_metrics[['mlb_name', 'strikes_gained']].rename(columns={'strikes_gained': 'strike_prob_added'}).round(2)
+    sum_df = sum_df.sort_values(by='strike_prob_added', ascending=False).reset_index()
 
-# groupby catcher name and get counts
-pitch_counts = df_filtered.groupby('mlb_name')['mlb_name'].transform('count')
+    # loop to print
+    for index, row in sum_df.iterrows():
+        print(f"{row['mlb_name']}: {row['strike_prob_added']}")
 
-# qualified player treshold: 6 pitches per game
-threshold = 6*162
+    # avg strike probability added per catcher, normalized to the mean of all marginal pitches
+    mean_df = catcher_metrics[['mlb_name']].assign(strike_prob_added=catcher_metrics['avg_spg'].round(4))
+    mean_df['avg_sg_marg_rel'] = mean_df['strike_prob_added'] - marginal_mean
 
-# filter by threshold
-df_qualified = df_filtered[pitch_counts > threshold]
+    # sort from highest to lowest avg strikes gained relative to mean
+    mean_df = mean_df.sort_values(by='avg_sg_marg_rel', ascending=False).round(4).reset_index()
 
-# filter only called strikes w/ <0.6 prob and balls w/ >0.4 prob
-df_qualified = df_qualified[
-    ((df_qualified['description'] == 'called_strike') & (df_qualified['strike_probability'] < 0.5)) |
-    ((df_qualified['description'] == 'ball') & (df_qualified['strike_probability'] > 0.5))]
+    # loop to print
+    for index, row in mean_df.iterrows():
+        print(f"{row['mlb_name']}: {row['avg_sg_marg_rel']}")
 
-# strikes gained per catcher over the 2023 season
-sum_df = df_qualified.groupby('mlb_name')['strike_prob_added'].sum().round(2).astype(float).reset_index()
-sum_df = sum_df.sort_values(by='strike_prob_added', ascending=False).round(2).reset_index()
+    # catcher framing runs on marginal pitches per catcher over 2023
+    cfr_marg_df = catcher_metrics[['mlb_name', 'cfr_marg']].round(2)
+    cfr_marg_df = cfr_marg_df.sort_values(by='cfr_marg', ascending=True).reset_index()
 
-# loop to print
-for index, row in sum_df.iterrows():
-    print(f"{row['mlb_name']}: {row['strike_prob_added']}")
+    # loop to print
 
-# calculate average strike probability gained for a marginal pitch
-avg_spg = df_qualified['strike_prob_added'].mean()
+    for index, row in cfr_marg_df.iterrows():
+        print(f"{row['mlb_name']}: {row['cfr_marg']}")
 
-# groupby catcher name, calculate avg strike probability added per catcher 
-mean_df = df_qualified.groupby('mlb_name')['strike_prob_added'].mean().round(4).astype(float).reset_index()
+    return sum_df, mean_df, cfr_marg_df
 
-# normalize to mean
-mean_df['avg_sg_marg_rel'] = mean_df['strike_prob_added'] - avg_spg
+# leaderboard csvs read by framing_dash.py
+def save_leaderboards(sum_df, mean_df, cfr_marg_df, output_dir='.'):
 
-# sort from highest to lowest avg strikes gained relative to mean
-mean_df = mean_df.sort_values(by='avg_sg_marg_rel', ascending=False).round(4).reset_index()
+    # total strikes gained
+    sum_df.to_csv(os.path.join(output_dir, '2023_Catcher_Strikes_Gained.csv'))
 
-# loop to print
-for index, row in mean_df.iterrows():
-    print(f"{row['mlb_name']}: {row['avg_sg_marg_rel']}")
+    # avg strike probability gained on marginal pitches relative to the mean
+    mean_df.to_csv(os.path.join(output_dir, '2023_Catcher_Avg_SPG_Marg_Rel.csv'))
 
-# catcher framing runs on marginal pitches per catcher over 2023
-    
-# calculate avg value of a ball and strike
-called_strikes = df_2023[df_2023['description'] == 'called_strike']
-called_balls = df_2023[df_2023['description'] == 'ball']
+    # total catcher framing runs on marginal pitches
+    cfr_marg_df.to_csv(os.path.join(output_dir, '2023_Catcher_Framing_Runs_Marg.csv'))
 
-called_strike_val = called_strikes['delta_run_exp'].mean()
-called_ball_val = called_balls['delta_run_exp'].mean()
+# called strikes under 50% strike probability and balls over 50%, of every catcher, as the dashboard plots them
+def dashboard_pitches(df_2023):
+    df = df_2023[
+        ((df_2023['description'] == 'called_strike') & (df_2023['strike_probability'] < 0.5)) |
+        ((df_2023['description'] == 'ball') & (df_2023['strike_probability'] > 0.5))]
+    return df[dash_columns].astype(dash_dtypes).reset_index(drop=True)
 
-# catcher framing runs on marginal pitches per catcher over 2023
-df_qualified['cfr_marg'] = df_qualified.apply(lambda row: abs(row['strike_prob_added']) * called_strike_val if row['description'] == 'called_strike' else (abs(row['strike_prob_added']) * called_ball_val if row['description'] == 'ball' else None), axis=1)
+# arrow table of the dashboard pitches with NaN kept as a float value instead of an arrow null, a float column
+# without nulls has no validity bitmap and converts to numpy without a copy when the dashboard maps the file
+def dashboard_table(df):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for i, col in enumerate(table.column_names):
+        if pd.api.types.is_float_dtype(df[col]):
+            table = table.set_column(i, col, pa.array(df[col].to_numpy(), from_pandas=False))
+    return table
 
-cfr_marg_df = df_qualified.groupby('mlb_name')['cfr_marg'].sum().round(2).astype(float).reset_index()
-cfr_marg_df = cfr_marg_df.sort_values(by='cfr_marg', ascending=True).round(2).reset_index()
+# written under a temporary name first so a dashboard starting meanwhile never maps a partial file
+def save_dashboard_pitches(df_2023, output_dir='.'):
+    path = os.path.join(output_dir, dash_pitches_path)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    feather.write_feather(dashboard_table(dashboard_pitches(df_2023)), tmp_path, compression='uncompressed')
+    os.replace(tmp_path, path)
 
-# loop to print
+def main():
+    parser = argparse.ArgumentParser(description="Score the 2023 season with the strike probability model and build the catcher framing leaderboards.")
+    parser.add_argument('--retrain', action='store_true', help="train the model again even if a saved model exists")
+    parser.add_argument('--model', default=model_path, help="saved model file")
+    parser.add_argument('--bootstrap', type=int, default=0, metavar='N', help="also save confidence intervals of the catcher metrics from N bootstrap resamples")
+    args = parser.parse_args()
 
-for index, row in cfr_marg_df.iterrows():
-    print(f"{row['mlb_name']}: {row['cfr_marg']}")
+    # the model is trained once and reused by later runs and by strike_model.py
+    if args.retrain or not os.path.exists(args.model):
+        train(args.model)
 
-# save dfs
+    df_2023 = score_season(load_model(args.model))
+    sum_df, mean_df, cfr_marg_df = leaderboards(df_2023)
 
-# mlb pitch data paired w/ mlb ids
-df_2023.to_csv('2023_Catcher_Name_and_SP.csv')
+    # save dfs
 
-# total strikes gained
-sum_df.to_csv('2023_Catcher_Strikes_Gained.csv')
+    # mlb pitch data paired w/ mlb ids
+    df_2023.to_csv('2023_Catcher_Name_and_SP.csv')
 
-# avg strike probability gained on marginal pitches relative to the mean
-mean_df.to_csv('2023_Catcher_Avg_SPG_Marg_Rel.csv')
+    save_leaderboards(sum_df, mean_df, cfr_marg_df)
 
-# total catcher framing runs on marginal pitches
-cfr_marg_df.to_csv('2023_Catcher_Framing_Runs_Marg.csv')
+    # the dashboard's pitches, a small fraction of the full pitch csv
+    save_dashboard_pitches(df_2023)
+
+    # every catcher metric with its bootstrap confidence interval, so small samples are not read as precise
+    if args.bootstrap:
+        called_strike_val, called_ball_val = run_values(df_2023)
+        ci_df = bootstrap_metrics(marginal_pitches(df_2023, threshold), ['mlb_name'], called_strike_val, called_ball_val, args.bootstrap)
+        ci_df.round(4).to_csv('2023_Catcher_Framing_CI.csv', index=False)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+import os
+import json
+import time
+import argparse
+from functools import lru_cache
+import numpy as np
+
+# compiled trees of the strike probability model, written by export_trees next to the xgboost model
+trees_path = 'Strike_Prob_Model.npz'
+
+# objectives the evaluator can turn margins into predictions for
+link_functions = {
+    'binary:logistic': 'logistic',
+    'reg:logistic': 'logistic',
+    'reg:squarederror': 'identity',
+}
+
+# base_score as saved by xgboost, "5E-1" in older versions and "[5E-1]" (one value per target) in newer ones
+def parse_base_score(value):
+    return float(value.strip('[]').split(',')[0])
+
+# every tree of an xgboost json model flattened into one set of node arrays, with the offset of each tree's root
+# a leaf has left == -1 and its value in threshold, as xgboost stores it
+def compile_trees(model):
+    learner = model['learner']
+    objective = learner['objective']['name']
+    if objective not in link_functions:
+        raise ValueError(f"Objective {objective} is not supported")
+    if int(learner['learner_model_param'].get('num_target', '1')) > 1 or int(learner['learner_model_param'].get('num_class', '0')) > 1:
+        raise ValueError("Only single output models are supported")
+
+    trees = learner['gradient_booster']['model']['trees']
+    if any(any(tree['split_type']) for tree in trees):
+        raise ValueError("Categorical splits are not supported")
+
+    sizes = np.array([len(tree['left_children']) for tree in trees])
+    roots = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+    def nodes(key, dtype):
+        return np.concatenate([np.asarray(tree[key], dtype=dtype) for tree in trees])
+
+    # child indices become offsets into the flat arrays, leaves keep -1
+    left = nodes('left_children', np.int32)
+    right = nodes('right_children', np.int32)
+    offsets = np.repeat(roots, sizes).astype(np.int32)
+    leaf = left < 0
+    left = np.where(leaf, -1, left + offsets)
+    right = np.where(leaf, -1, right + offsets)
+
+    base_score = parse_base_score(learner['learner_model_param']['base_score'])
+    link = link_functions[objective]
+    base_margin = np.log(base_score / (1 - base_score)) if link == 'logistic' else base_score
+
+    attributes = learner.get('attributes', {})
+    return {
+        'roots': roots.astype(np.int32),
+        'left': left.astype(np.int32),
+        'right': right.astype(np.int32),
+        'feature': nodes('split_indices', np.int32),
+        'threshold': nodes('split_conditions', np.float32),
+        'default_left': nodes('default_left', np.bool_),
+        'base_margin': np.float64(base_margin),
+        'link': np.array(link),
+        'features': np.array(json.loads(attributes['features']) if 'features' in attributes else learner.get('feature_names', [])),
+        'handedness': np.array(attributes.get('handedness', '{}')),
+    }
+
+# compile a model saved as json by strike_model.save_model and write the arrays to an npz file
+def export_trees(model_path, out_path=trees_path):
+    with open(model_path) as f:
+        trees = compile_trees(json.load(f))
+    np.savez(out_path, **trees)
+    return trees
+
+# rows walked through the trees at a time, small enough for the node arrays of a block to stay in cache
+block_rows = 2048
+
+@lru_cache(maxsize=4)
+def _cached_trees(path, mtime_ns):
+    with np.load(path) as data:
+        trees = {key: data[key] for key in data.files}
+    trees['max_depth'] = tree_depth(trees)
+
+    # leaves point to themselves, so rows that reached a leaf stay there without a check
+    leaf = trees['left'] < 0
+    nodes = np.arange(len(leaf), dtype=np.int32)
+    trees['walk_left'] = np.where(leaf, nodes, trees['left'])
+    trees['walk_right'] = np.where(leaf, nodes, trees['right'])
+    return trees
+
+# compiled trees from an npz file, loaded once per file version
+def load_trees(path=trees_path):
+    return _cached_trees(path, os.stat(path).st_mtime_ns)
+
+# number of steps from the deepest leaf to its root, the number of traversal steps every row needs
+def tree_depth(trees):
+    depth = np.zeros(len(trees['left']), dtype=np.int32)
+    inner = np.flatnonzero(trees['left'] >= 0)
+    # children always come after their parent, so one pass in node order sets every depth
+    for node in inner:
+        depth[trees['left'][node]] = depth[trees['right'][node]] = depth[node] + 1
+    return int(depth.max())
+
+# sum of the leaf values of every tree plus the base margin, for a float matrix of rows x model features
+# a block of rows walks all trees at once: each step moves every (row, tree) pair one level down
+def predict_margin(trees, X):
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    left, right, feature = trees['walk_left'], trees['walk_right'], trees['feature']
+    threshold, default_left = trees['threshold'], trees['default_left']
+    margin = np.empty(len(X))
+
+    for start in range(0, len(X), block_rows):
+        block = X[start:start + block_rows]
+        flat = block.ravel()
+        row_offsets = (np.arange(len(block), dtype=np.int32) * block.shape[1])[:, None]
+        node = np.broadcast_to(trees['roots'], (len(block), len(trees['roots']))).copy()
+
+        for _ in range(trees['max_depth']):
+            value = flat[row_offsets + feature[node]]
+            go_left = value < threshold[node]
+            missing = np.isnan(value)
+            if missing.any():
+                go_left[missing] = default_left[node[missing]]
+            node = np.where(go_left, left[node], right[node])
+
+        margin[start:start + len(block)] = threshold[node].sum(axis=1, dtype=np.float64)
+
+    return margin + trees['base_margin']
+
+def predict(trees, X):
+    margin = predict_margin(trees, X)
+    if str(trees['link']) == 'logistic':
+        return 1 / (1 + np.exp(-margin))
+    return margin
+
+# model inputs of a statcast frame in the saved feature order, handedness encoded as it was for training
+def feature_matrix(df, trees):
+    handedness = json.loads(str(trees['handedness']))
+    columns = []
+    for col in trees['features']:
+        values = df[col].map(handedness) if col in ('stand', 'p_throws') else df[col]
+        columns.append(np.asarray(values, dtype=np.float32))
+    return np.column_stack(columns)
+
+# strike probability of every pitch without xgboost
+def predict_strike_probability(df, trees):
+    return predict(trees, feature_matrix(df, trees))
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile the strike probability model into numpy arrays for fast scoring without xgboost.")
+    parser.add_argument('model', nargs='?', default='Strike_Prob_Model.json', help="json model saved by framing_model.py or strike_model.py")
+    parser.add_argument('output', nargs='?', default=trees_path, help="npz file to write")
+    parser.add_argument('--verify', type=int, default=0, metavar='N', help="compare with xgboost on N random pitches (needs xgboost)")
+    args = parser.parse_args()
+
+    trees = export_trees(args.model, args.output)
+    print(f"Wrote {len(trees['roots'])} trees, {len(trees['left'])} nodes, to {args.output}.")
+
+    if args.verify:
+        import xgboost as xgb
+        rng = np.random.default_rng(0)
+        n = args.verify
+        X = np.column_stack([rng.integers(0, 2, n), rng.integers(0, 2, n), rng.integers(0, 4, n), rng.integers(0, 3, n),
+                             rng.normal(0, 1, n), rng.normal(2.5, 1, n), rng.normal(3.4, 0.15, n), rng.normal(1.6, 0.15, n)]).astype(np.float32)
+        bst = xgb.Booster()
+        bst.load_model(args.model)
+        started = time.perf_counter()
+        ours = predict(load_trees(args.output), X)
+        elapsed = time.perf_counter() - started
+        print(f"Max difference to xgboost over {n} pitches: {np.abs(ours - bst.inplace_predict(X)).max():.2e} ({elapsed * 1000:.1f} ms).")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,290 @@
+import os
+import sys
+import ast
+import json
+import time
+import hashlib
+import argparse
+import datetime
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+# the statcast scripts, which the stages import only when they run, so checking a pipeline that
+# is up to date does not pay for importing xgboost
+statcast_dir = os.path.dirname(os.path.abspath(__file__))
+catching_dir = os.path.join(statcast_dir, 'catching')
+run_expectancy_dir = os.path.join(statcast_dir, 'run-expectancy')
+script_dirs = [statcast_dir, catching_dir, run_expectancy_dir]
+
+# qualified catcher threshold
+sys.path.append(catching_dir)
+from framing_metrics import threshold
+
+# default parameters of the stages
+season_start, season_end = '2023-03-30', '2023-10-20'
+default_cache_dir = os.path.join(statcast_dir, 'statcast_cache')
+default_workers = 4
+
+# fingerprints of the last successful run of every stage, and the content digests of the files they were taken from
+state_file = 'pipeline_state.json'
+
+# stage functions, run in worker processes with the stage's parameters
+
+def fetch_stage(params):
+    sys.path.append(statcast_dir)
+    from statcast_cache import statcast_range
+    statcast_range(params['start'], params['end'], cache_dir=params['cache_dir'], columns=['game_date'])
+
+def score_stage(params):
+    sys.path.append(catching_dir)
+    sys.path.append(statcast_dir)
+    from statcast_cache import statcast_range
+    from strike_model import load_model, score
+    from framing_model import add_catcher_names
+    df = score(statcast_range(params['start'], params['end'], cache_dir=params['cache_dir']), load_model(params['model']))
+    add_catcher_names(df, params['ids']).to_csv(params['pitches'])
+
+def aggregate_stage(params):
+    sys.path.append(catching_dir)
+    import pandas as pd
+    from framing_model import leaderboards, save_leaderboards
+    df = pd.read_csv(params['pitches'], index_col=0)
+    save_leaderboards(*leaderboards(df, params['threshold']), params['output_dir'])
+
+def run_expectancy_stage(params):
+    os.environ['MPLBACKEND'] = 'Agg'
+    sys.path.append(run_expectancy_dir)
+    from run_exp_matrix import build_matrix
+    build_matrix(params['start'], params['end'], params['output_dir'], cache_dir=params['cache_dir'])
+
+def dashboard_stage(params):
+    sys.path.append(catching_dir)
+    import pandas as pd
+    from framing_model import dash_columns, save_dashboard_pitches
+    save_dashboard_pitches(pd.read_csv(params['pitches'], usecols=dash_columns), params['output_dir'])
+
+# day pickles of the statcast cache for a date range, named as statcast_cache.day_path names them
+def day_paths(start, end, cache_dir):
+    first, last = datetime.date.fromisoformat(start), datetime.date.fromisoformat(end)
+    return [os.path.join(cache_dir, f"statcast_{first + datetime.timedelta(days=offset)}.pkl")
+            for offset in range((last - first).days + 1)]
+
+# the given scripts and every statcast script they import, directly or through each other, found by parsing
+# their imports, so a stage runs again when the code of any module it ends up running changes
+def script_inputs(*scripts):
+    found = []
+    todo = list(scripts)
+    while todo:
+        path = todo.pop()
+        if path in found:
+            continue
+        found.append(path)
+        with open(path) as f:
+            tree = ast.parse(f.read(), path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                for folder in script_dirs:
+                    candidate = os.path.join(folder, f"{name.split('.')[0]}.py")
+                    if os.path.exists(candidate):
+                        todo.append(candidate)
+                        break
+    return sorted(found)
+
+# every stage with the function that runs it, its parameters, the files it reads (data and the scripts whose
+# code it runs) and the files it writes; a stage depends on the stages that write its inputs
+def build_stages(start=season_start, end=season_end, output_dir='.', cache_dir=default_cache_dir,
+                 model='Strike_Prob_Model.json', ids='mlb_ids.csv', threshold=threshold):
+    days = day_paths(start, end, cache_dir)
+    pitches = os.path.join(output_dir, '2023_Catcher_Name_and_SP.csv')
+    leaderboard_csvs = [os.path.join(output_dir, name) for name in
+                        ['2023_Catcher_Strikes_Gained.csv', '2023_Catcher_Avg_SPG_Marg_Rel.csv', '2023_Catcher_Framing_Runs_Marg.csv']]
+    return [
+        {'name': 'fetch', 'run': fetch_stage,
+         'params': {'start': start, 'end': end, 'cache_dir': cache_dir},
+         'inputs': script_inputs(os.path.join(statcast_dir, 'statcast_cache.py')),
+         'outputs': days},
+        {'name': 'score', 'run': score_stage,
+         'params': {'start': start, 'end': end, 'cache_dir': cache_dir, 'model': model, 'ids': ids, 'pitches': pitches},
+         'inputs': days + [model, ids] + script_inputs(*[os.path.join(catching_dir, name) for name in ['strike_model.py', 'framing_model.py']]),
+         'outputs': [pitches]},
+        {'name': 'aggregate', 'run': aggregate_stage,
+         'params': {'pitches': pitches, 'threshold': threshold, 'output_dir': output_dir},
+         'inputs': [pitches] + script_inputs(*[os.path.join(catching_dir, name) for name in ['framing_metrics.py', 'framing_model.py']]),
+         'outputs': leaderboard_csvs},
+        {'name': 're_matrix', 'run': run_expectancy_stage,
+         'params': {'start': start, 'end': end, 'cache_dir': cache_dir, 'output_dir': output_dir},
+         'inputs': days + script_inputs(os.path.join(run_expectancy_dir, 'run_exp_matrix.py')),
+         'outputs': [os.path.join(output_dir, '2023_MLB_Run_Exp_Matrix.csv'), os.path.join(output_dir, '2023_MLB_Run_Exp_Matrix.png')]},
+        {'name': 'dashboard', 'run': dashboard_stage,
+         'params': {'pitches': pitches, 'output_dir': output_dir},
+         'inputs': [pitches] + script_inputs(os.path.join(catching_dir, 'framing_model.py')),
+         'outputs': [os.path.join(output_dir, '2023_Framing_Dash_Pitches.feather')]},
+    ]
+
+def upstream(stage, stages):
+    return [other['name'] for other in stages if set(other['outputs']) & set(stage['inputs'])]
+
+# the named stages and every stage they depend on, in pipeline order
+def select_stages(stages, targets):
+    if not targets:
+        return stages
+    by_name = {stage['name']: stage for stage in stages}
+    unknown = [name for name in targets if name not in by_name]
+    if unknown:
+        raise ValueError(f"Unknown stages {', '.join(unknown)}, the stages are {', '.join(by_name)}")
+    selected = set()
+    todo = list(targets)
+    while todo:
+        name = todo.pop()
+        if name not in selected:
+            selected.add(name)
+            todo.extend(upstream(by_name[name], stages))
+    return [stage for stage in stages if stage['name'] in selected]
+
+def load_state(path):
+    if not os.path.exists(path):
+        return {'files': {}, 'stages': {}}
+    with open(path) as f:
+        return json.load(f)
+
+# written under a temporary name first so an interrupted run never leaves a partial state file
+def save_state(state, path):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+# content digest of a file, hashed again only when its size or modification time changed since it was last hashed,
+# so a rewritten file with the same content does not rerun the stages reading it
+def file_digest(path, files):
+    stat = os.stat(path)
+    known = files.get(path)
+    if known and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+        return known[2]
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    files[path] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+    return files[path][2]
+
+# fingerprint of a stage: its parameters and the content of every input
+def stage_fingerprint(stage, files):
+    missing = [path for path in stage['inputs'] if not os.path.exists(path)]
+    if missing:
+        raise FileNotFoundError(f"{stage['name']} needs {', '.join(missing[:3])}{' and more' if len(missing) > 3 else ''}")
+    digest = hashlib.sha1(json.dumps(stage['params'], sort_keys=True).encode())
+    for path in stage['inputs']:
+        digest.update(path.encode())
+        digest.update(file_digest(path, files).encode())
+    return digest.hexdigest()
+
+# run the stages whose fingerprint changed since their last successful run or whose outputs are missing,
+# each as soon as the stages it depends on are done, independent stages at the same time in worker processes
+# a failed stage stops only the stages that depend on it
+def run_pipeline(stages, state_path, workers=default_workers, force=(), dry_run=False):
+    state = load_state(state_path)
+    waiting = list(stages)
+    done, failed, ran = set(), {}, []
+    running = {}
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while waiting or running:
+            for stage in list(waiting):
+                needs = upstream(stage, stages)
+                if any(name in failed for name in needs):
+                    waiting.remove(stage)
+                    failed[stage['name']] = "an upstream stage failed"
+                    continue
+                if not all(name in done for name in needs):
+                    continue
+                waiting.remove(stage)
+
+                # in a dry run a stage below one that would run would run too, its inputs are not written yet
+                if dry_run and any(name in ran for name in needs):
+                    ran.append(stage['name'])
+                    done.add(stage['name'])
+                    continue
+
+                try:
+                    fingerprint = stage_fingerprint(stage, state['files'])
+                except FileNotFoundError as e:
+                    failed[stage['name']] = str(e)
+                    continue
+                up_to_date = (state['stages'].get(stage['name']) == fingerprint and stage['name'] not in force
+                              and all(os.path.exists(path) for path in stage['outputs']))
+                if up_to_date or dry_run:
+                    if not up_to_date:
+                        ran.append(stage['name'])
+                    done.add(stage['name'])
+                    continue
+
+                print(f"Running {stage['name']}.")
+                running[executor.submit(stage['run'], stage['params'])] = (stage, fingerprint, time.perf_counter())
+
+            if not running:
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, fingerprint, started = running.pop(future)
+                try:
+                    future.result()
+                except Exception as e:
+                    failed[stage['name']] = f"{type(e).__name__}: {e}"
+                    state['stages'].pop(stage['name'], None)
+                else:
+                    for path in stage['outputs']:
+                        file_digest(path, state['files'])
+                    state['stages'][stage['name']] = fingerprint
+                    done.add(stage['name'])
+                    ran.append(stage['name'])
+                    print(f"Finished {stage['name']} in {time.perf_counter() - started:.1f}s.")
+                save_state(state, state_path)
+
+    # digests of files no stage reads or writes any more are dropped
+    known = {path for stage in stages for path in stage['inputs'] + stage['outputs']}
+    if not dry_run and set(state['files']) - known:
+        state['files'] = {path: entry for path, entry in state['files'].items() if path in known}
+        save_state(state, state_path)
+
+    return ran, failed
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the statcast stages whose inputs or parameters changed since their last run.")
+    parser.add_argument('stages', nargs='*', help="stages to bring up to date with the stages they depend on (default all): fetch, score, aggregate, re_matrix, dashboard")
+    parser.add_argument('--start', default=season_start, help="first date of the season")
+    parser.add_argument('--end', default=season_end, help="last date of the season")
+    parser.add_argument('--output-dir', default='.', help="folder the csvs and the state file are written to")
+    parser.add_argument('--cache-dir', default=default_cache_dir, help="folder of the statcast day cache")
+    parser.add_argument('--model', default='Strike_Prob_Model.json', help="saved model file, trained by framing_model.py")
+    parser.add_argument('--ids', default='mlb_ids.csv', help="csv of player names and MLB IDs")
+    parser.add_argument('--threshold', type=int, default=threshold, help="called pitches a catcher needs to qualify")
+    parser.add_argument('--workers', type=int, default=default_workers, help="stages run at the same time")
+    parser.add_argument('--force', nargs='*', default=[], metavar='STAGE', help="run these stages even if they are up to date")
+    parser.add_argument('--dry-run', action='store_true', help="only list the stages that would run")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        stages = select_stages(build_stages(args.start, args.end, args.output_dir, args.cache_dir, args.model, args.ids, args.threshold), args.stages)
+    except ValueError as e:
+        parser.error(str(e))
+    ran, failed = run_pipeline(stages, os.path.join(args.output_dir, state_file), args.workers, set(args.force), args.dry_run)
+
+    if args.dry_run:
+        print(f"Would run: {', '.join(ran) or 'nothing'}.")
+    else:
+        print(f"Ran {', '.join(ran) or 'nothing'} in {time.perf_counter() - started:.2f}s.")
+    for name, reason in failed.items():
+        print(f"{name} failed: {reason}")
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+import os
+import time
+import argparse
+import datetime
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pandas as pd
+
+# folder holding one pickle of statcast pitches per game day, shared by every statcast script
+cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'statcast_cache')
+
+# days fetched in one request, and number of requests in flight at once
+chunk_days = 7
+default_workers = 4
+
+# attempts per chunk, waiting retry_wait seconds after the first failure and twice as long after each next one
+retries = 3
+retry_wait = 2.0
+
+# statcast keeps correcting the most recent games, so days this close to today are fetched again on every run
+refresh_days = 3
+
+# live source: baseball savant through pybaseball, imported only when it is used
+def pybaseball_fetcher(start_dt, end_dt):
+    import pybaseball
+    return pybaseball.statcast(start_dt=start_dt, end_dt=end_dt, verbose=False, parallel=False)
+
+# season csv as saved with df.to_csv, read once per process
+@lru_cache(maxsize=4)
+def read_season_csv(path):
+    df = pd.read_csv(path, index_col=0)
+    df['game_date'] = pd.to_datetime(df['game_date']).dt.strftime("%Y-%m-%d")
+    return df
+
+# local stand-in for the live source, e.g. a season csv saved by an older run or a small test fixture
+def csv_fetcher(path):
+    def fetch(start_dt, end_dt):
+        df = read_season_csv(path)
+        return df[(df['game_date'] >= start_dt) & (df['game_date'] <= end_dt)]
+    return fetch
+
+def day_path(date_str, cache_dir=cache_dir):
+    return os.path.join(cache_dir, f"statcast_{date_str}.pkl")
+
+def date_range(start, end):
+    start, end = pd.Timestamp(start).date(), pd.Timestamp(end).date()
+    for offset in range((end - start).days + 1):
+        yield (start + datetime.timedelta(days=offset)).strftime("%Y-%m-%d")
+
+# days of the range that have to be fetched: not cached yet, or recent enough that statcast may still change them
+def missing_days(start, end, cache_dir=cache_dir, refresh=False):
+    recent = (datetime.date.today() - datetime.timedelta(days=refresh_days)).strftime("%Y-%m-%d")
+    return [date_str for date_str in date_range(start, end)
+            if refresh or date_str >= recent or not os.path.exists(day_path(date_str, cache_dir))]
+
+# runs of consecutive days, at most chunk_days long, so each request covers a single date range
+def day_chunks(days, size=chunk_days):
+    chunks = []
+    for date_str in days:
+        previous = chunks[-1][-1] if chunks else None
+        if previous and len(chunks[-1]) < size and pd.Timestamp(date_str) - pd.Timestamp(previous) == pd.Timedelta(days=1):
+            chunks[-1].append(date_str)
+        else:
+            chunks.append([date_str])
+    return chunks
+
+# fetch one chunk and write a pickle for each of its days, days without games get an empty frame so they are not fetched again
+def fetch_chunk(days, fetcher, cache_dir=cache_dir):
+    for attempt in range(retries):
+        try:
+            df = fetcher(days[0], days[-1])
+            break
+        except Exception as e:
+            if attempt == retries - 1:
+                raise
+            print(f"Fetching {days[0]} to {days[-1]} failed ({e}), retrying.")
+            time.sleep(retry_wait * 2 ** attempt)
+
+    game_days = pd.to_datetime(df['game_date']).dt.strftime("%Y-%m-%d") if len(df) else pd.Series(dtype=str)
+    rows = df.groupby(game_days.to_numpy()).indices if len(df) else {}
+
+    # written under a temporary name first so an interrupted run or another process never reads a partial file
+    for date_str in days:
+        tmp_path = f"{day_path(date_str, cache_dir)}.{os.getpid()}.tmp"
+        df.iloc[rows.get(date_str, [])].to_pickle(tmp_path)
+        os.replace(tmp_path, day_path(date_str, cache_dir))
+
+    return len(df)
+
+# statcast pitches between two dates (inclusive), only the days missing from the cache are fetched,
+# in chunks spread across a pool of threads
+# with columns set each day is cut down to those columns as it is loaded, so long ranges stay small in memory
+def statcast_range(start, end, fetcher=pybaseball_fetcher, cache_dir=cache_dir, workers=default_workers, refresh=False, columns=None):
+    os.makedirs(cache_dir, exist_ok=True)
+    chunks = day_chunks(missing_days(start, end, cache_dir, refresh))
+
+    # every chunk is attempted before failures are raised, so the chunks that did arrive are cached
+    # and the next run only asks for the ones that failed
+    fetched = 0
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(fetch_chunk, days, fetcher, cache_dir): days for days in chunks}
+        for future in as_completed(futures):
+            try:
+                fetched += future.result()
+            except Exception as e:
+                failed.append(f"{futures[future][0]} to {futures[future][-1]}: {e}")
+
+    if failed:
+        raise RuntimeError(f"Could not fetch {len(failed)} of {len(chunks)} chunks, run again to retry them:\n" + "\n".join(failed))
+    if chunks:
+        print(f"Fetched {fetched} pitches for {sum(len(days) for days in chunks)} days from {start} to {end}.")
+
+    days = []
+    for date_str in date_range(start, end):
+        df = pd.read_pickle(day_path(date_str, cache_dir))
+        if len(df):
+            days.append(df[columns] if columns is not None else df)
+    if not days:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(days, ignore_index=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch statcast pitches into the local day cache.")
+    parser.add_argument('start', help="first date, YYYY-MM-DD")
+    parser.add_argument('end', help="last date, YYYY-MM-DD")
+    parser.add_argument('--workers', type=int, default=default_workers, help="requests in flight at once")
+    parser.add_argument('--refresh', action='store_true', help="fetch every day again, not only the missing and recent ones")
+    parser.add_argument('--csv', default=None, help="read from a saved season csv instead of baseball savant")
+    parser.add_argument('--cache-dir', default=cache_dir, help="folder of the day cache")
+    args = parser.parse_args()
+
+    fetcher = csv_fetcher(args.csv) if args.csv else pybaseball_fetcher
+    df = statcast_range(args.start, args.end, fetcher, args.cache_dir, args.workers, args.refresh)
+    print(f"{len(df)} pitches from {args.start} to {args.end} in {args.cache_dir}.")
+
+if __name__ == '__main__':
+    main()
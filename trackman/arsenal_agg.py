@@ -0,0 +1,132 @@
+import os
+import datetime
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+from session_store import load_session
+
+# pitch metrics summarized per pitcher and pitch type
+summary_metrics = ['RelSpeed', 'SpinRate', 'InducedVertBreak', 'HorzBreak']
+summary_percentiles = [0.1, 0.5, 0.9]
+
+# groups of the session comparison, one row per pitch type of each pitcher's session
+session_keys = ['Pitcher', 'Date', 'TaggedPitchType']
+
+# convert name from Last, First to First Last
+def format_name(name):
+    parts = name.split(", ")
+    if len(parts) == 2:
+        return f"{parts[1]} {parts[0]}"
+    return name
+
+# convert name from Last, First to First_Last for file names
+def file_name_part(name):
+    return "_".join(name.split(", ")[::-1]).replace(" ", "_")
+
+# convert date formats to yyyy_mm_dd format for file path
+def parse_date(date_str):
+    for fmt in ("%m/%d/%Y", "%m-%d-%Y", "%Y-%m-%d"):  # Add more formats if needed
+        try:
+            return datetime.datetime.strptime(date_str, fmt).strftime("%Y_%m_%d")
+        except ValueError:
+            pass
+    raise ValueError(f"Date format for '{date_str}' is not supported")
+
+# mean, std, count and percentiles of each metric per group, columns are (metric, stat)
+# both aggregations run on the grouped arrays, there is no python loop over groups
+def summarize_arsenal(df, by=('Pitcher', 'TaggedPitchType')):
+    by = list(by)
+    metrics = [col for col in summary_metrics if col in df.columns]
+    # aggregate in float64, the store keeps float32 metrics which print badly once rounded
+    df = df.dropna(subset=by).astype({col: 'float64' for col in metrics})
+    grouped = df.groupby(by, observed=True)[metrics]
+
+    moments = grouped.agg(['mean', 'std', 'count'])
+
+    percentiles = grouped.quantile(summary_percentiles).unstack(-1)
+    percentiles.columns = pd.MultiIndex.from_tuples([(metric, f"p{round(q * 100)}") for metric, q in percentiles.columns],
+                                                    names=['metric', 'stat'])
+
+    summary = pd.concat([moments, percentiles], axis=1)[metrics]
+    summary.columns.names = ['metric', 'stat']
+    return summary
+
+# mean of each metric per group as plain columns
+def arsenal_means(summary):
+    return summary.xs('mean', axis=1, level='stat')
+
+# mean of each metric per pitch type over every pitcher of the summary, from the per group means and counts
+def pitch_type_means(summary):
+    means = summary.xs('mean', axis=1, level='stat')
+    counts = summary.xs('count', axis=1, level='stat')
+    totals = (means * counts).fillna(0).groupby(level='TaggedPitchType', observed=True).sum()
+    return totals / counts.groupby(level='TaggedPitchType', observed=True).sum()
+
+# sums of HB, IVB and velocity and of their squares and HB x IVB per group, in one grouped pass
+# sums add across files, so sessions aggregated separately are combined with a groupby sum
+def movement_sums(df, by=session_keys):
+    by = list(by)
+    df = df.dropna(subset=by + ['HorzBreak', 'InducedVertBreak'])
+    x = df['HorzBreak'].to_numpy(dtype='float64')
+    y = df['InducedVertBreak'].to_numpy(dtype='float64')
+    v = df['RelSpeed'].to_numpy(dtype='float64')
+    has_v = ~np.isnan(v)
+    v = np.where(has_v, v, 0.0)
+
+    terms = pd.DataFrame({'n': 1, 'x': x, 'y': y, 'xx': x * x, 'yy': y * y, 'xy': x * y,
+                          'nv': has_v.astype('int64'), 'v': v, 'vv': v * v}, index=df.index)
+    return terms.groupby([df[col] for col in by], observed=True).sum()
+
+# means, standard deviations and HB/IVB covariance from movement_sums
+def movement_stats(sums):
+    n = sums['n']
+    stats = pd.DataFrame({'count': n, 'mean_x': sums['x'] / n, 'mean_y': sums['y'] / n}, index=sums.index)
+
+    # sample (co)variances, zero for a single pitch
+    dof = (n - 1).where(n > 1)
+    stats['var_x'] = ((sums['xx'] - sums['x'] * stats['mean_x']) / dof).fillna(0.0).clip(lower=0)
+    stats['var_y'] = ((sums['yy'] - sums['y'] * stats['mean_y']) / dof).fillna(0.0).clip(lower=0)
+    stats['cov_xy'] = ((sums['xy'] - sums['x'] * stats['mean_y']) / dof).fillna(0.0)
+    stats['std_x'] = np.sqrt(stats['var_x'])
+    stats['std_y'] = np.sqrt(stats['var_y'])
+
+    nv = sums['nv'].where(sums['nv'] > 0)
+    stats['mean_v'] = sums['v'] / nv
+    stats['std_v'] = np.sqrt(((sums['vv'] - sums['v'] * stats['mean_v']) / (nv - 1).where(nv > 1)).clip(lower=0))
+    return stats
+
+# pitch counts per group in a bins x bins grid of HB and IVB over extent, one bincount for every group
+# returns the non empty cells as rows of the group columns, 'cell' (x cell * bins + y cell) and 'count'
+def movement_density(df, by=session_keys, bins=50, extent=(-25, 25)):
+    by = list(by)
+    df = df.dropna(subset=by + ['HorzBreak', 'InducedVertBreak'])
+    x = df['HorzBreak'].to_numpy(dtype='float64')
+    y = df['InducedVertBreak'].to_numpy(dtype='float64')
+    in_range = (x >= extent[0]) & (x < extent[1]) & (y >= extent[0]) & (y < extent[1])
+
+    groups, group_index = pd.MultiIndex.from_frame(df[by]).factorize()
+    width = (extent[1] - extent[0]) / bins
+    xi = ((x[in_range] - extent[0]) / width).astype(np.intp)
+    yi = ((y[in_range] - extent[0]) / width).astype(np.intp)
+    flat = np.bincount((groups[in_range] * bins + xi) * bins + yi, minlength=len(group_index) * bins * bins)
+
+    nonzero = np.flatnonzero(flat)
+    cells = pd.DataFrame(list(group_index[nonzero // (bins * bins)]), columns=by)
+    cells['cell'] = nonzero % (bins * bins)
+    cells['count'] = flat[nonzero]
+    return cells
+
+# sessions kept by session_arsenal per process, about one team day, the frames are whole sessions
+# so the cache is bounded by a day's work rather than growing across the days of a long running process
+session_cache_size = 64
+
+@lru_cache(maxsize=session_cache_size)
+def _cached_session_arsenal(path, mtime_ns):
+    df = load_session(path)
+    return df, summarize_arsenal(df)
+
+# session data and its arsenal summary, computed once per file version (path + mtime)
+# the returned frames are shared between callers, copy them before modifying
+def session_arsenal(path):
+    path = os.path.abspath(path)
+    return _cached_session_arsenal(path, os.stat(path).st_mtime_ns)
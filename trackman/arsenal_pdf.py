@@ -1,46 +1,102 @@
+import os
+import argparse
+import datetime
 import pandas as pd
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_pdf import PdfPages
+from arsenal_agg import session_arsenal, summarize_arsenal, arsenal_means, format_name
+from session_store import read_trackman_csv, read_store, session_csvs
 
-# read in csv as dataframe
-df = pd.read_csv(r'PATH TO CSV.csv', index_col=False)
+# initialize import/export paths, the import can be a csv or a session store partition folder
+import_filename = r'PATH TO CSV.csv'
+output_filename = r'PATH TO OUTPUT.pdf'
 
-# select columns
-df=df[['PitchNo','Pitcher','TaggedPitchType','RelSpeed','SpinRate','InducedVertBreak', 'HorzBreak']]
+# root folder holding one YYYY-MM-DD folder of downloaded sessions per day, used by the roster mode
+data_root = r'PATH TO DATA FOLDER'
 
-# create pitch count column
-pitch_count = df['PitchNo'].max()
+# columns the arsenal table needs
+roster_columns = ['Pitcher', 'TaggedPitchType', 'RelSpeed', 'SpinRate', 'InducedVertBreak', 'HorzBreak']
 
-# round values to 1 decimal
-df=df.round(decimals=1)
+# mean pitch metrics by pitcher and pitch type as a table ready dataframe
+def arsenal_table(means):
 
-# function to transform names
-def transform_name(name):
-    last, first = name.split(', ')
-    return f"{first} {last}"
+    # take the means into a new dataframe with first last pitcher names
+    grouped_df=means.reset_index()
+    grouped_df['Pitcher'] = grouped_df['Pitcher'].map(format_name)
 
-# apply the function
-df['Pitcher'] = df['Pitcher'].apply(transform_name)
+    # round values to 1 decimal
+    grouped_df=grouped_df.round(decimals=1)
 
-# group data into new datframe and take mean of pitch type
-grouped_df=df.groupby(['Pitcher','TaggedPitchType']).mean().reset_index()
+    # rename columns
+    grouped_df.rename(columns={'TaggedPitchType': 'Pitch Type', 'RelSpeed': 'Velocity', 'InducedVertBreak': 'IVB', 'HorzBreak': 'HB'}, inplace=True)
 
-# drop column
-grouped_df=grouped_df.drop('PitchNo', axis=1)
+    return grouped_df
 
-# round values to 1 decimal
-grouped_df=grouped_df.round(decimals=1)
+# plotting DataFrame as a table and removing axis
+def table_figure(grouped_df):
+    fig, ax = plt.subplots(figsize=(5, 2))
+    ax.axis('tight')
+    ax.axis('off')
+    ax.table(cellText=grouped_df.values, colLabels=grouped_df.columns, loc='center')
+    return fig
 
-# rename columns
-grouped_df.rename(columns={'TaggedPitchType': 'Pitch Type', 'RelSpeed': 'Velocity', 'InducedVertBreak': 'IVB', 'HorzBreak': 'HB'}, inplace=True)
+# one page table for a single session
+def session_pdf(data_path, output_path):
 
-# plotting DataFrame as a table and removing axis
-fig, ax = plt.subplots(figsize=(5, 2))
-ax.axis('tight')
-ax.axis('off')
-ax.table(cellText=grouped_df.values, colLabels=grouped_df.columns, loc='center')
-
-# save the figure to a PDF file
-pdf = PdfPages(r'PATH TO OUTPUT.pdf')
-pdf.savefig(fig, bbox_inches='tight')
-pdf.close()
+    # read in session and its mean pitch metrics by pitcher and pitch type
+    df, summary = session_arsenal(data_path)
+    fig = table_figure(arsenal_table(arsenal_means(summary)))
+
+    # save the figure to a PDF file
+    with PdfPages(output_path) as pdf:
+        pdf.savefig(fig, bbox_inches='tight')
+    plt.close(fig)
+
+# one page per pitcher for every pitch in df, aggregated in a single grouped pass over all sessions
+# each page is written and its figure closed before the next one is drawn, so memory does not grow with the roster
+def roster_pdf(df, output_path):
+    means = arsenal_means(summarize_arsenal(df))
+
+    with PdfPages(output_path) as pdf:
+        for pitcher, pitcher_means in means.groupby(level='Pitcher', sort=True):
+            fig = table_figure(arsenal_table(pitcher_means))
+            pdf.savefig(fig, bbox_inches='tight')
+            plt.close(fig)
+
+    return means.index.get_level_values('Pitcher').nunique()
+
+# every session downloaded between start and end, reading only the table columns
+def load_roster(start, end, store_dir=None):
+    if store_dir:
+        return read_store(store_dir, columns=roster_columns, start_date=start, end_date=end)
+
+    frames = [read_trackman_csv(data_path, roster_columns) for data_path in session_csvs(data_root, start, end)]
+    if not frames:
+        return pd.DataFrame(columns=roster_columns)
+    return pd.concat(frames, ignore_index=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Write pitch arsenal tables to PDF.")
+    parser.add_argument('--start', type=datetime.date.fromisoformat, default=None, help="write one page per pitcher for every session from this date, YYYY-MM-DD")
+    parser.add_argument('--end', type=datetime.date.fromisoformat, default=None, help="last date of the roster packet (default the start date)")
+    parser.add_argument('--store', default=None, help="read the roster from this session store instead of the downloaded csvs")
+    parser.add_argument('--output', default=output_filename, help="pdf to write")
+    args = parser.parse_args()
+
+    # without a date the single session csv is written as before
+    if args.start is None:
+        session_pdf(import_filename, args.output)
+        return
+
+    df = load_roster(args.start, args.end or args.start, store_dir=args.store)
+    if df.empty:
+        print(f"No sessions found from {args.start} to {args.end or args.start}.")
+        return
+
+    pitchers = roster_pdf(df, args.output)
+    print(f"Wrote {pitchers} pitchers to {os.path.basename(args.output)}.")
+
+if __name__ == '__main__':
+    main()
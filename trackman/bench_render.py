@@ -0,0 +1,186 @@
+import os
+import sys
+import json
+import base64
+import argparse
+import tempfile
+import datetime
+import statistics
+import tracemalloc
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import pandas as pd
+from matplotlib.backends.backend_pdf import PdfPages
+from plotly.io.json import to_json_plotly
+from session_store import load_session, read_trackman_csv
+from arsenal_agg import summarize_arsenal, arsenal_means
+from chart_templates import plot_movement_chart, movement_chart_name
+from pitch_report import plot_report
+from arsenal_pdf import roster_columns, arsenal_table, table_figure
+import synth_sessions
+from stage_metrics import StageTimer
+
+# stored timings to compare against, written with --save-baseline
+baseline_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json')
+
+# stages faster than this are too noisy to flag as regressions
+noise_floor = 0.005
+
+# trackman_viz.py and pretty_plot.py: one movement png per session
+def bench_movement_chart(paths, out_dir, timer):
+    for path in paths:
+        with timer.stage('read'):
+            df = load_session(path)
+        with timer.stage('aggregate'):
+            summary = summarize_arsenal(df)
+        with timer.stage('plot'):
+            template = plot_movement_chart(df, summary)
+        with timer.stage('save'):
+            template.fig.savefig(os.path.join(out_dir, movement_chart_name(df)), bbox_inches='tight', pad_inches=0.3)
+            template.clear()
+
+# pitch_report.py: command and break plot png per session
+def bench_pitch_report(paths, out_dir, timer):
+    for i, path in enumerate(paths):
+        with timer.stage('read'):
+            df = load_session(path)
+        with timer.stage('plot'):
+            template = plot_report(df)
+        with timer.stage('save'):
+            template.fig.savefig(os.path.join(out_dir, f"report_{i}.png"))
+            template.clear()
+
+# arsenal_pdf.py roster mode: every session aggregated at once, one pdf page per pitcher
+def bench_arsenal_pdf(paths, out_dir, timer):
+    with timer.stage('read'):
+        df = pd.concat([read_trackman_csv(path, roster_columns) for path in paths], ignore_index=True)
+    with timer.stage('aggregate'):
+        means = arsenal_means(summarize_arsenal(df))
+    with PdfPages(os.path.join(out_dir, 'roster.pdf')) as pdf:
+        for pitcher, pitcher_means in means.groupby(level='Pitcher', sort=True):
+            with timer.stage('plot'):
+                fig = table_figure(arsenal_table(pitcher_means))
+            with timer.stage('save'):
+                pdf.savefig(fig, bbox_inches='tight')
+                plt.close(fig)
+
+# pitch_dash.py callbacks: one upload of every session, then figures built and serialized for the browser as Dash does
+def bench_pitch_dash(paths, out_dir, timer):
+    import pitch_dash
+
+    combined = os.path.join(out_dir, 'upload.csv')
+    if not os.path.exists(combined):
+        pd.concat([pd.read_csv(path) for path in paths], ignore_index=True).to_csv(combined, index=False)
+    with open(combined, 'rb') as f:
+        contents = 'data:text/csv;base64,' + base64.b64encode(f.read()).decode()
+
+    with timer.stage('read'):
+        df = pitch_dash.parse_contents(contents, 'upload.csv')
+    with timer.stage('plot'):
+        figures = [pitch_dash.create_movement_plot(df), pitch_dash.create_command_plot(df)]
+    with timer.stage('save'):
+        for fig in figures:
+            to_json_plotly(fig)
+
+cases = {
+    'movement_chart': bench_movement_chart,
+    'pitch_report': bench_pitch_report,
+    'arsenal_pdf': bench_arsenal_pdf,
+    'pitch_dash': bench_pitch_dash,
+}
+
+# median seconds over repeat runs, and the peak memory of one extra traced run
+def run_case(case, paths, out_dir, repeat=3):
+    runs = []
+    for _ in range(repeat):
+        timer = StageTimer()
+        cases[case](paths, out_dir, timer)
+        runs.append(timer.wall)
+
+    # tracemalloc slows everything down, so memory is measured in its own run
+    timer = StageTimer()
+    tracemalloc.start()
+    try:
+        cases[case](paths, out_dir, timer)
+    finally:
+        tracemalloc.stop()
+
+    return {stage: {'seconds': statistics.median(run[stage] for run in runs), 'peak_mb': timer.peak[stage] / 2**20}
+            for stage in runs[0]}
+
+# stages slower than the baseline by more than tolerance, as (case, stage, baseline seconds, seconds)
+def regressions(results, baseline, tolerance=0.25):
+    slower = []
+    for case, stages in results['cases'].items():
+        for stage, result in stages.items():
+            base = baseline['cases'].get(case, {}).get(stage)
+            if base is None:
+                continue
+            if result['seconds'] > base['seconds'] * (1 + tolerance) and result['seconds'] - base['seconds'] > noise_floor:
+                slower.append((case, stage, base['seconds'], result['seconds']))
+    return slower
+
+def print_results(results, baseline=None):
+    print(f"{'case':<16}{'stage':<11}{'seconds':>10}{'baseline':>10}{'peak MB':>10}")
+    for case, stages in results['cases'].items():
+        for stage, result in stages.items():
+            base = baseline['cases'].get(case, {}).get(stage) if baseline else None
+            base_str = f"{base['seconds']:.3f}" if base else '-'
+            print(f"{case:<16}{stage:<11}{result['seconds']:>10.3f}{base_str:>10}{result['peak_mb']:>10.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Time and measure peak memory of the TrackMan render paths on synthetic sessions.")
+    parser.add_argument('--sessions', type=int, default=60, help="sessions per day")
+    parser.add_argument('--pitches', type=int, default=40, help="pitches per session")
+    parser.add_argument('--pitch-types', type=int, default=4, help="pitch types per pitcher")
+    parser.add_argument('--days', type=int, default=1, help="number of days of sessions")
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per case, the median is reported")
+    parser.add_argument('--cases', default=','.join(cases), help="comma separated cases to run")
+    parser.add_argument('--baseline', default=baseline_path, help="baseline json to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown against the baseline before failing")
+    parser.add_argument('--output', default=None, help="also write the results to this json file")
+    args = parser.parse_args()
+
+    workload = {'sessions': args.sessions, 'pitches': args.pitches, 'pitch_types': args.pitch_types, 'days': args.days}
+    results = {'workload': workload, 'cases': {}}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_root = os.path.join(tmp, 'data')
+        out_dir = os.path.join(tmp, 'out')
+        os.makedirs(out_dir)
+        paths = synth_sessions.generate(data_root, datetime.date(2024, 2, 1), args.days, args.sessions, args.pitches, args.pitch_types)
+
+        for case in args.cases.split(','):
+            results['cases'][case] = run_case(case, paths, out_dir, args.repeat)
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline['workload'] != workload:
+            print(f"Baseline was recorded with {baseline['workload']}, not comparing.")
+            baseline = None
+
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=1)
+        print(f"Saved baseline to {args.baseline}.")
+        return
+
+    if baseline:
+        slower = regressions(results, baseline, args.tolerance)
+        for case, stage, base_seconds, seconds in slower:
+            print(f"Regression: {case} {stage} took {seconds:.3f}s against a baseline of {base_seconds:.3f}s.")
+        if slower:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+import os
+import matplotlib.pyplot as plt
+from matplotlib.patches import Rectangle
+from matplotlib.patches import Polygon
+from arsenal_agg import session_arsenal, pitch_type_means, format_name, file_name_part, parse_date
+
+# a figure whose static chrome (limits, grid, center lines, strike zone) is drawn once
+# and reused, each render only adds the data artists and clear() takes them off again
+class ChartTemplate:
+
+    def __init__(self, fig, axes):
+        self.fig = fig
+        self.axes = axes
+        self.static = {ax: set(ax.get_children()) for ax in axes}
+
+    # remove everything added since the template was built
+    def clear(self):
+        for ax in self.axes:
+            for artist in ax.get_children():
+                if artist not in self.static[ax]:
+                    artist.remove()
+            ax.set_title('')
+            ax.set_title('', loc='left')
+        for legend in list(self.fig.legends):
+            legend.remove()
+        if self.fig.get_suptitle():
+            self.fig.suptitle('')
+
+# templates built so far in this process
+templates = {}
+
+# movement chart chrome: limits, center lines and optionally ticks every 8 with the dashed 8/16 guides
+# without guides the ticks are matplotlib's defaults, as trackman_viz.py has always drawn them
+def draw_movement_chrome(ax, guides=True, center_width=2):
+    ax.set_xlim(-24, 24)
+    ax.set_ylim(-24, 24)
+
+    # central axis lines
+    ax.axhline(0, color='black', linewidth=center_width)
+    ax.axvline(0, color='black', linewidth=center_width)
+
+    # ticks and dotted lines at specified positions (8, 16, -8, -16)
+    if guides:
+        ax.set_xticks(range(-24, 25, 8))
+        ax.set_yticks(range(-24, 25, 8))
+        for pos in [8, 16, -8, -16]:
+            ax.axhline(y=pos, color='grey', linestyle='--', linewidth=0.5)
+            ax.axvline(x=pos, color='grey', linestyle='--', linewidth=0.5)
+
+# command chart chrome: strike zone and home plate, no axis
+def draw_command_chrome(ax):
+    ax.set_xlim(-2, 2)
+    ax.set_ylim(-0.5, 5.5)
+    ax.set_aspect('equal', adjustable='box')
+    ax.axis('off')
+    ax.add_patch(Rectangle((-0.708, 1.5), 1.416, 2.1, fill=False, edgecolor='black', lw=1))
+    ax.add_patch(Polygon([[-0.708, 0.01], [-0.608, 0.21], [0, 0.41], [0.608, 0.21], [0.708, 0.01]], closed=True, fill=False))
+
+# single movement chart used by trackman_viz.py (guides=False) and pretty_plot.py (guides=True)
+def movement_template(guides=False):
+    key = ('movement', guides)
+    if key not in templates:
+        fig, ax = plt.subplots(figsize=(10, 6))
+        ax.set_xlabel('Horizontal Break (in)')
+        ax.set_ylabel('Induced Vertical Break (in)')
+        ax.grid(which='major', linestyle=':', linewidth='0.5', color='gray')
+        draw_movement_chrome(ax, guides=guides)
+        ax.spines['right'].set_visible(False)
+        ax.spines['top'].set_visible(False)
+        templates[key] = ChartTemplate(fig, [ax])
+    return templates[key]
+
+# command and break plots side by side used by pitch_report.py
+def report_template():
+    key = ('report',)
+    if key not in templates:
+        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(7, 5))
+        draw_command_chrome(ax1)
+        draw_movement_chrome(ax2, guides=True, center_width=1)
+        ax2.set_aspect('equal', adjustable='box')
+        ax2.tick_params(labelsize=8)
+        templates[key] = ChartTemplate(fig, [ax1, ax2])
+    return templates[key]
+
+# draw a session's pitch movement with the average of each pitch type on the cached template
+# every tagged pitch of the file is drawn and averaged by pitch type, whoever threw it, and the
+# title names the first pitcher; a session without tagged pitches gives an empty titled chart
+# returns the template, the caller saves the figure and then calls template.clear()
+def plot_movement_chart(df, summary, guides=False):
+
+    pitcher_name = df.loc[0, 'Pitcher']
+    session_date = df.loc[0, 'Date']
+
+    # condense df to the tagged pitches, mean pitch metrics by tagged pitch type
+    df_condensed = df[['TaggedPitchType', 'RelSpeed', 'InducedVertBreak', 'HorzBreak']]
+    df_condensed = df_condensed.dropna(subset=['TaggedPitchType'])
+    grouped_df = pitch_type_means(summary)
+
+    # create standard color map by pitch type for plot
+    pitch_types = df_condensed['TaggedPitchType'].unique()
+    colors = plt.get_cmap('Dark2', len(pitch_types))
+    color_map = {pitch_type: colors(i) for i, pitch_type in enumerate(pitch_types)}
+
+    template = movement_template(guides)
+    ax = template.axes[0]
+
+    try:
+
+        # plot for each pitch type
+        for pitch_type in pitch_types:
+
+            subset = df_condensed[df_condensed['TaggedPitchType'] == pitch_type]
+            ax.scatter(subset['HorzBreak'], subset['InducedVertBreak'], color=color_map[pitch_type], s=50, alpha=0.25, edgecolor='none')
+
+            if pitch_type in grouped_df.index:
+
+                # plot average pitch
+                avg_horz_break = grouped_df.loc[pitch_type, 'HorzBreak']
+                avg_vert_break = grouped_df.loc[pitch_type, 'InducedVertBreak']
+                ax.scatter(avg_horz_break, avg_vert_break, color=color_map[pitch_type], s=50, label=pitch_type, alpha=1.0)
+                rounded_rel_speed = round(grouped_df.loc[pitch_type, 'RelSpeed'], 1)
+                ax.text(avg_horz_break + 0.5, avg_vert_break + 0.5, f"{rounded_rel_speed}", fontsize=8, va='center')
+
+        ax.set_title(f"{format_name(pitcher_name)} - {session_date}", loc='left')
+        if len(grouped_df):
+            ax.legend(loc='upper center', bbox_to_anchor=(0.5, -0.10), ncols=len(grouped_df), frameon=False)
+
+    except Exception:
+        template.clear()
+        raise
+
+    return template
+
+# file name of a session's movement chart, First_Last_yyyy_mm_dd.png
+def movement_chart_name(df):
+    return f"{file_name_part(df.loc[0, 'Pitcher'])}_{parse_date(df.loc[0, 'Date'])}.png"
+
+# plot one session's pitch movement, save it in export_dir and return the png path
+def render_movement_chart(data_path, export_dir, guides=False):
+
+    # read in session and its mean pitch metrics by tagged pitch type
+    df, summary = session_arsenal(data_path)
+
+    template = plot_movement_chart(df, summary, guides)
+
+    # always take the data back off, the template is reused for the next session
+    try:
+        output_path = os.path.join(export_dir, movement_chart_name(df))
+        template.fig.savefig(output_path, bbox_inches='tight', pad_inches=0.3)
+    finally:
+        template.clear()
+
+    return output_path
@@ -1,5 +1,10 @@
+import os
 import base64
+import tempfile
+import hashlib
 import io
+import threading
+from collections import OrderedDict
 import dash
 from dash.dependencies import Input, Output, State
 from dash import dcc
@@ -7,10 +12,69 @@ from dash import html
 import dash_bootstrap_components as dbc
 import plotly.express as px
 import plotly.graph_objects as go
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+from session_store import csv_dtypes, read_trackman_csv, session_partitions
+from arsenal_agg import session_keys, movement_sums, movement_stats, movement_density
 
-# Initialize the Dash app with Bootstrap
-app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
+# number of parsed uploads kept in memory, the least recently used one is dropped first
+upload_cache_size = 8
+
+# folder parsed uploads are also pickled to, None to keep them in memory only
+# set it when serving with several worker processes or background callbacks, which each have their own
+# memory cache, so an upload parsed by one process is loaded from disk by the others instead of re-parsed
+upload_spill_dir = None
+
+# run the upload and figure callbacks as background callbacks when diskcache is installed,
+# so one large upload does not hold a server worker while other users interact
+background_callbacks = False
+background_cache_dir = os.path.join(tempfile.gettempdir(), 'pitch_dash_callbacks')
+
+# filter by pitch type in the browser: the figures are sent once per upload and the dropdown
+# only toggles trace visibility in a clientside callback, with no round trip to the server
+clientside_filtering = False
+
+# uploads with more pitches than this are drawn with WebGL traces instead of SVG
+webgl_threshold = 5000
+
+# level of detail: above lod_threshold pitches, draw each pitch type as counts in a lod_bins x lod_bins grid
+# plus a random sample of at most lod_sample raw pitches, so the browser stays responsive with a season of data
+lod_mode = False
+lod_threshold = 20000
+lod_bins = 50
+lod_sample = 3000
+
+# columns read from an upload, everything else in the export is skipped while parsing
+dash_columns = ['Pitcher', 'Date', 'TaggedPitchType', 'RelSpeed', 'InducedVertBreak', 'HorzBreak', 'PlateLocHeight', 'PlateLocSide']
+
+# session store dtypes of the numeric and pitch type columns, parquet uploads are cast to them like csv uploads are parsed with them
+# the name and date columns are left as read, astype('str') would turn their missing values into the text 'nan' on older pandas
+dash_dtypes = {col: csv_dtypes[col] for col in dash_columns if csv_dtypes[col] != 'str'}
+
+# base64 characters decoded at a time while streaming an upload into the parser, a multiple of 4
+upload_chunk_chars = 4 << 20
+
+# session comparison: sessions come from several uploads, or from the columnar session store
+# (session_store.py) between two dates when compare_store_dir is set
+compare_store_dir = None
+
+# columns read from a store session for the comparison
+compare_columns = ['Pitcher', 'Date', 'TaggedPitchType', 'RelSpeed', 'InducedVertBreak', 'HorzBreak']
+
+# number of sessions whose aggregates are kept in memory, adding a session to the comparison only aggregates that session
+compare_cache_size = 512
+
+# bins per axis of the movement density contours, and how many standard deviations the movement ellipses span
+compare_bins = 50
+ellipse_sigma = 2
+
+# metric plotted against the session date, and the movement_stats columns of its mean and standard deviation
+drift_metrics = {
+    'RelSpeed': ('mean_v', 'std_v'),
+    'InducedVertBreak': ('mean_y', 'std_y'),
+    'HorzBreak': ('mean_x', 'std_x'),
+}
 
 # Initialize default figures with no data
 default_fig = go.Figure()
@@ -23,7 +87,24 @@ default_fig.update_layout(
     plot_bgcolor='white'
 )
 
-app.layout = dbc.Container([
+# style of both upload buttons
+upload_button_style = {
+    'backgroundColor': 'blue',
+    'color': 'white',
+    'borderRadius': '5px',
+    'padding': '10px 20px',
+    'border': 'none',
+    'cursor': 'pointer',
+    'fontSize': '16px',
+    'fontWeight': 'bold',
+    'outline': 'none',
+    'boxShadow': 'none',
+    'height': '38px',
+    'lineHeight': '19px'
+}
+
+# page layout, the same for every app built by create_app
+layout = dbc.Container([
     dbc.Row([
         dbc.Col(html.H1("Pitching Dashboard"), width=12)
     ]),
@@ -34,20 +115,7 @@ app.layout = dbc.Container([
             children=html.Button(
                 'Upload File',
                 id='upload-button',
-                style={
-                    'backgroundColor': 'blue',
-                    'color': 'white',
-                    'borderRadius': '5px',
-                    'padding': '10px 20px',
-                    'border': 'none',
-                    'cursor': 'pointer',
-                    'fontSize': '16px',
-                    'fontWeight': 'bold',
-                    'outline': 'none',
-                    'boxShadow': 'none',
-                    'height': '38px',
-                    'lineHeight': '19px'
-                }
+                style=upload_button_style
             ),
             multiple=False,
             style={
@@ -90,17 +158,91 @@ app.layout = dbc.Container([
         dbc.Col(dcc.Graph(id='command-plot', figure=default_fig, config={'displayModeBar': False}), width=6),
         dbc.Col(dcc.Graph(id='movement-plot', figure=default_fig, config={'displayModeBar': False}), width=6),
     ]),
+
+    # figures of the whole upload, only filled in clientside filtering mode
+    dcc.Store(id='upload-figures'),
+
+    # Rows for comparing several sessions, uploaded together or read from the session store
+    dbc.Row([
+        dbc.Col(html.H2("Compare Sessions"), width=12)
+    ], style={'marginTop': '20px'}),
+    dbc.Row([
+        dbc.Col(dcc.Upload(
+            id='upload-sessions',
+            children=html.Button('Upload Sessions', id='upload-sessions-button', style=upload_button_style),
+            multiple=True,
+            style={'textAlign': 'left', 'display': 'inline-block', 'marginLeft': 5}
+        ), width=2, style={'paddingRight': '5px', 'paddingLeft': '5px'}),
+
+        dbc.Col(dcc.DatePickerRange(
+            id='compare-store-dates',
+            display_format='YYYY-MM-DD',
+        ), width=4, style={'display': 'block' if compare_store_dir else 'none'}),
+
+        dbc.Col(dcc.Dropdown(
+            id='compare-pitcher-dropdown',
+            options=[],
+            placeholder="Select a pitcher",
+            clearable=False,
+        ), width=3),
+
+        dbc.Col(dcc.Dropdown(
+            id='compare-metric-dropdown',
+            options=[{'label': metric, 'value': metric} for metric in drift_metrics],
+            value='RelSpeed',
+            clearable=False,
+        ), width=3),
+    ], align='center', style={'marginTop': '5px', 'marginBottom': '5px'}),
+
+    dbc.Row([
+        dbc.Col(dcc.Graph(id='drift-plot', figure=default_fig, config={'displayModeBar': False}), width=6),
+        dbc.Col(dcc.Graph(id='distribution-plot', figure=default_fig, config={'displayModeBar': False}), width=6),
+    ]),
 ], fluid=False)
 
+# file-like view of the base64 payload of an upload that decodes one chunk at a time,
+# so the decoded file never has to be held in memory next to the base64 string
+class Base64Reader(io.RawIOBase):
+
+    def __init__(self, contents, start):
+        self.contents = contents
+        self.pos = start
+        self.buffer = memoryview(b'')
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if not self.buffer:
+            chunk = self.contents[self.pos:self.pos + upload_chunk_chars]
+            self.pos += len(chunk)
+            self.buffer = memoryview(base64.b64decode(chunk))
+        n = min(len(b), len(self.buffer))
+        b[:n] = self.buffer[:n]
+        self.buffer = self.buffer[n:]
+        return n
+
+# leading bytes of the formats accepted besides plain csv
+gzip_magic = b'\x1f\x8b'
+zstd_magic = b'\x28\xb5\x2f\xfd'
+parquet_magic = b'PAR1'
+
 # Function to parse uploaded data
+# accepts csv, gzip or zstd compressed csv and parquet, reading only dash_columns with the session store dtypes
 def parse_contents(contents, filename):
-    content_type, content_string = contents.split(',')
+    start = contents.index(',') + 1
+    head = base64.b64decode(contents[start:start + 8])
 
-    decoded = base64.b64decode(content_string)
     try:
-        if 'csv' in filename:
-            # Assume that the user uploaded a CSV
-            df = pd.read_csv(io.StringIO(decoded.decode('utf-8')))
+        if head.startswith(parquet_magic):
+            # parquet keeps its metadata at the end of the file, so it is decoded whole, it is already compact
+            df = pd.read_parquet(io.BytesIO(base64.b64decode(contents[start:])), columns=dash_columns).astype(dash_dtypes)
+        elif head.startswith(gzip_magic) or head.startswith(zstd_magic) or filename.lower().endswith('.csv'):
+            stream = io.BufferedReader(Base64Reader(contents, start), buffer_size=1 << 20)
+            if head.startswith(gzip_magic) or head.startswith(zstd_magic):
+                codec = 'gzip' if head.startswith(gzip_magic) else 'zstd'
+                stream = pa.CompressedInputStream(pa.PythonFile(stream, mode='r'), codec)
+            df = read_trackman_csv(stream, dash_columns)
         else:
             return html.Div([
                 'Unsupported file type.'
@@ -112,9 +254,161 @@ def parse_contents(contents, filename):
         ])
     return df
 
-def create_command_plot(df):
-    fig = px.scatter(df, x='PlateLocSide', y='PlateLocHeight', color='TaggedPitchType', width=400, height=500)
-    fig.update_traces(marker=dict(size=12))
+# parsed uploads by content hash, most recently used last
+# request threads of one process (e.g. waitress --threads) share the cache, so every lookup and insert holds the lock;
+# parsing happens outside it, two threads parsing the same new upload just store the same frame twice
+upload_cache = OrderedDict()
+upload_cache_lock = threading.Lock()
+
+# sha256 of the upload contents, the same file uploaded again maps to the same key
+# hashed in chunks so the string is not copied whole
+def upload_key(contents):
+    digest = hashlib.sha256()
+    for pos in range(0, len(contents), upload_chunk_chars):
+        digest.update(contents[pos:pos + upload_chunk_chars].encode())
+    return digest.hexdigest()
+
+def spill_path(key):
+    return os.path.join(upload_spill_dir, f"{key}.pkl")
+
+# parse an upload once and keep the typed dataframe, so a pitch type change only filters it
+def cached_upload(contents, filename, key=None):
+    key = key or upload_key(contents)
+
+    with upload_cache_lock:
+        if key in upload_cache:
+            upload_cache.move_to_end(key)
+            return upload_cache[key]
+
+    if upload_spill_dir and os.path.exists(spill_path(key)):
+        df = pd.read_pickle(spill_path(key))
+    else:
+        df = parse_contents(contents, filename)
+        if not isinstance(df, pd.DataFrame):
+            return None
+        df['TaggedPitchType'] = df['TaggedPitchType'].astype('category')
+
+        # written under a temporary name first so another process never reads a partial file
+        if upload_spill_dir:
+            os.makedirs(upload_spill_dir, exist_ok=True)
+            tmp_path = f"{spill_path(key)}.{os.getpid()}.tmp"
+            df.to_pickle(tmp_path)
+            os.replace(tmp_path, spill_path(key))
+
+    with upload_cache_lock:
+        upload_cache[key] = df
+        while len(upload_cache) > upload_cache_size:
+            upload_cache.popitem(last=False)
+
+    return df
+
+# dropdown options for the pitch types in an upload
+def pitch_type_options(df):
+    pitch_options = [{'label': pitch_type, 'value': pitch_type} for pitch_type in df['TaggedPitchType'].dropna().unique()]
+    pitch_options.insert(0, {'label': 'All Pitches', 'value': 'All Pitches'})
+    return pitch_options
+
+# pitches of one pitch type, or every pitch for 'All Pitches'
+def filter_pitch_type(df, pitch_type):
+    if pitch_type == 'All Pitches':
+        return df
+    return df[df['TaggedPitchType'] == pitch_type]
+
+# random rows, each pitch type keeping its share of the at most n rows, in upload order
+def sample_pitches(df, n, seed=0):
+    shuffled = df.iloc[np.random.default_rng(seed).permutation(len(df))]
+    groups = shuffled.groupby('TaggedPitchType', observed=True)['TaggedPitchType']
+    keep = groups.cumcount() < np.ceil(groups.transform('size') * n / len(df))
+    return shuffled[keep.to_numpy()].sort_index()
+
+# pitch counts per pitch type in a bins x bins grid over the plot range
+# returns (pitch type, cell x centers, cell y centers, counts) for every pitch type with pitches in range
+def density_cells(df, x, y, x_range, y_range, bins=lod_bins):
+    data = df[['TaggedPitchType', x, y]].dropna()
+    xs = data[x].to_numpy()
+    ys = data[y].to_numpy()
+    in_range = (xs >= x_range[0]) & (xs < x_range[1]) & (ys >= y_range[0]) & (ys < y_range[1])
+
+    pitch_types = data['TaggedPitchType'].astype('category').cat
+    codes = pitch_types.codes.to_numpy().astype(np.intp)[in_range]
+    xi = ((xs[in_range] - x_range[0]) / (x_range[1] - x_range[0]) * bins).astype(int)
+    yi = ((ys[in_range] - y_range[0]) / (y_range[1] - y_range[0]) * bins).astype(int)
+
+    # one flat bincount over (pitch type, x cell, y cell) instead of a histogram per pitch type
+    counts = np.bincount((codes * bins + xi) * bins + yi, minlength=len(pitch_types.categories) * bins * bins)
+    counts = counts.reshape(len(pitch_types.categories), bins, bins)
+
+    x_centers = x_range[0] + (np.arange(bins) + 0.5) * (x_range[1] - x_range[0]) / bins
+    y_centers = y_range[0] + (np.arange(bins) + 0.5) * (y_range[1] - y_range[0]) / bins
+
+    cells = []
+    for i, pitch_type in enumerate(pitch_types.categories):
+        ix, iy = np.nonzero(counts[i])
+        if len(ix):
+            cells.append((pitch_type, x_centers[ix], y_centers[iy], counts[i, ix, iy]))
+    return cells
+
+# plotly express default colors, given to pitch types in order of appearance as px.scatter does
+pitch_colors = px.colors.qualitative.Plotly
+
+# plotly.js typed array names of the numpy dtypes used in the figures
+typed_array_dtypes = {'float32': 'f4', 'float64': 'f8', 'int32': 'i4'}
+
+# numeric array as a base64 typed array, the compact form plotly uses for numpy data
+# int64 is narrowed to int32, nullable and other numeric dtypes without a name above are sent as float64, NaN for missing
+def typed_array(values):
+    if isinstance(getattr(values, 'dtype', None), pd.api.extensions.ExtensionDtype):
+        values = values.to_numpy(dtype='float64', na_value=np.nan)
+    values = np.ascontiguousarray(values)
+    if values.dtype == np.int64:
+        values = values.astype(np.int32)
+    elif values.dtype.name not in typed_array_dtypes:
+        values = values.astype(np.float64)
+    return {'dtype': typed_array_dtypes[values.dtype.name], 'bdata': base64.b64encode(values.tobytes()).decode()}
+
+# scatter traces of pitches colored by pitch type, WebGL for large uploads and binned counts plus a sample in lod mode
+# traces are plain dicts in the form px.scatter produces, which skips plotly's validation on every callback
+# the binned cells are named after their pitch type so legend clicks and the dropdown filter them with the points
+def pitch_traces(df, x, y, x_range, y_range):
+    lod = lod_mode and len(df) > lod_threshold
+    points = sample_pitches(df, lod_sample) if lod else df
+    trace_type = 'scattergl' if len(df) > webgl_threshold else 'scatter'
+    marker = dict(size=5, opacity=0.6) if lod else dict(size=12)
+
+    # colors follow the pitch type order of the full upload, also when only a sample is drawn
+    pitch_types = list(df['TaggedPitchType'].dropna().unique())
+    colors = {pitch_type: pitch_colors[i % len(pitch_colors)] for i, pitch_type in enumerate(pitch_types)}
+
+    # row positions of every pitch type in one grouped pass
+    rows = points.groupby('TaggedPitchType', observed=True, sort=False).indices
+    xs = points[x].to_numpy()
+    ys = points[y].to_numpy()
+
+    traces = []
+    for pitch_type in pitch_types:
+        if pitch_type not in rows:
+            continue
+        traces.append({
+            'type': trace_type, 'mode': 'markers', 'name': pitch_type, 'legendgroup': pitch_type, 'showlegend': True,
+            'x': typed_array(xs[rows[pitch_type]]), 'y': typed_array(ys[rows[pitch_type]]), 'xaxis': 'x', 'yaxis': 'y',
+            'marker': dict(marker, color=colors[pitch_type], symbol='circle'),
+            'hovertemplate': f"TaggedPitchType={pitch_type}<br>{x}=%{{x}}<br>{y}=%{{y}}<extra></extra>",
+        })
+
+    if lod:
+        for pitch_type, cell_x, cell_y, counts in density_cells(df, x, y, x_range, y_range):
+            traces.append({
+                'type': 'scattergl', 'mode': 'markers', 'name': pitch_type, 'legendgroup': pitch_type, 'showlegend': False,
+                'x': typed_array(cell_x), 'y': typed_array(cell_y), 'customdata': typed_array(counts),
+                'marker': dict(color=colors.get(pitch_type), size=typed_array(4 + 16 * np.sqrt(counts / counts.max())), opacity=0.35),
+                'hovertemplate': f"{pitch_type}: %{{customdata}} pitches<extra></extra>",
+            })
+
+    return traces
+
+# static layout of the command plot: strike zone, plate, ranges and legend, built once at startup
+def build_command_layout():
+    fig = go.Figure()
     fig.update_xaxes(range=[-2,2], showticklabels=False, title=None)
     fig.update_yaxes(range=[-0.5,5.5], showticklabels=False, title=None)
     fig.add_shape(type='rect', x0=-0.708, y0=1.5, x1=0.708, y1=3.6, line=dict(color="black", width=1))
@@ -129,7 +423,10 @@ def create_command_plot(df):
         plot_bgcolor='white',
         width=600,
         height=700,
+        margin=dict(t=60),
         legend=dict(
+            title_text='TaggedPitchType',
+            tracegroupgap=0,
             orientation="h",
             yanchor="bottom",
             y=1.02,
@@ -137,22 +434,22 @@ def create_command_plot(df):
             x=0.5
         )
     )
-    return fig
+    return fig.to_dict()['layout']
 
-def create_movement_plot(df):
-    fig = px.scatter(df, x='HorzBreak', y='InducedVertBreak', color='TaggedPitchType')
-    fig.update_traces(marker=dict(size=12))
+# static layout of the movement plot: ranges, ticks, dashed guides and center lines, built once at startup
+def build_movement_layout():
+    fig = go.Figure()
 
     tickvals = list(range(-16, 17, 8))
     ticktext = [str(val) for val in tickvals]
 
     # Update x-axis with specified tick values and add dashed lines
-    fig.update_xaxes(range=[-25, 25], tickvals=tickvals, ticktext=ticktext)
+    fig.update_xaxes(range=[-25, 25], tickvals=tickvals, ticktext=ticktext, title_text='HorzBreak')
     for val in tickvals:
         fig.add_shape(type='line', x0=val, y0=-25, x1=val, y1=25, line=dict(color="grey", width=1, dash="dash"))
 
     # Update y-axis with specified tick values and add dashed lines
-    fig.update_yaxes(range=[-25, 25], tickvals=tickvals, ticktext=ticktext)
+    fig.update_yaxes(range=[-25, 25], tickvals=tickvals, ticktext=ticktext, title_text='InducedVertBreak')
     for val in tickvals:
         fig.add_shape(type='line', x0=-25, y0=val, x1=25, y1=val, line=dict(color="grey", width=1, dash="dash"))
 
@@ -165,37 +462,196 @@ def create_movement_plot(df):
         plot_bgcolor='white',
         width=800,
         height=600,
+        margin=dict(t=60),
+        legend=dict(title_text='TaggedPitchType', tracegroupgap=0),
         showlegend=False
     )
-    return fig
+    return fig.to_dict()['layout']
+
+command_layout = build_command_layout()
+movement_layout = build_movement_layout()
+
+# figures are plain dicts of the pitch traces on the prebuilt layouts, Dash serializes them as they are
+def create_command_plot(df):
+    return {'data': pitch_traces(df, 'PlateLocSide', 'PlateLocHeight', (-2, 2), (-0.5, 5.5)), 'layout': command_layout}
+
+def create_movement_plot(df):
+    return {'data': pitch_traces(df, 'HorzBreak', 'InducedVertBreak', (-25, 25), (-25, 25)), 'layout': movement_layout}
+
+# per session sums and density cells (arsenal_agg.py) by upload hash or store partition, most recently used last
+session_aggregates = OrderedDict()
+session_aggregates_lock = threading.Lock()
+
+# aggregates of one session, load is only called when they are not cached yet
+# shared by request threads like upload_cache, the lock is held only around lookups and inserts
+def cached_aggregates(key, load):
+    with session_aggregates_lock:
+        if key in session_aggregates:
+            session_aggregates.move_to_end(key)
+            return session_aggregates[key]
+
+    df = load()
+    if df is None:
+        return None
+    aggregates = (movement_sums(df), movement_density(df, bins=compare_bins, extent=(-25, 25)))
+
+    with session_aggregates_lock:
+        session_aggregates[key] = aggregates
+        while len(session_aggregates) > compare_cache_size:
+            session_aggregates.popitem(last=False)
+
+    return aggregates
+
+# aggregates of every uploaded session
+def upload_aggregates(contents, filenames):
+    aggregates = []
+    for session_contents, filename in zip(contents or [], filenames or []):
+        key = upload_key(session_contents)
+        aggregates.append(cached_aggregates(key, lambda: cached_upload(session_contents, filename, key)))
+    return [a for a in aggregates if a is not None]
+
+# aggregates of every store session between two dates, a session is aggregated again when its files change
+def store_aggregates(store_dir, start_date, end_date):
+    if not (store_dir and start_date and end_date and os.path.isdir(store_dir)):
+        return []
+    aggregates = []
+    for path in session_partitions(store_dir, start_date, end_date):
+        files = tuple((entry.name, entry.stat().st_mtime_ns) for entry in os.scandir(path))
+        aggregates.append(cached_aggregates(('store', path, files), lambda: pd.read_parquet(path, columns=compare_columns)))
+    return aggregates
+
+# sums and density cells of all the sessions, a session split across several files is added together
+def combine_aggregates(aggregates):
+    sums = pd.concat([a[0] for a in aggregates]).groupby(level=session_keys, observed=True).sum()
+    cells = pd.concat([a[1] for a in aggregates]).groupby(session_keys + ['cell'], observed=True)['count'].sum()
+    return sums, cells
+
+# session means of the metric against the session date, with the standard deviation as error bars, one trace per pitch type
+def drift_traces(stats, metric, colors):
+    mean_col, std_col = drift_metrics[metric]
+    stats = stats.reset_index()
+    stats['session_date'] = pd.to_datetime(stats['Date'], format='mixed').dt.strftime("%Y-%m-%d")
+    stats = stats.sort_values('session_date')
+
+    traces = []
+    for pitch_type, rows in stats.groupby('TaggedPitchType', observed=True, sort=False).indices.items():
+        group = stats.iloc[rows]
+        traces.append({
+            'type': 'scatter', 'mode': 'lines+markers', 'name': pitch_type, 'legendgroup': pitch_type,
+            'x': list(group['session_date']), 'y': typed_array(group[mean_col].to_numpy()),
+            'error_y': {'type': 'data', 'array': typed_array(group[std_col].fillna(0).to_numpy()), 'visible': True},
+            'customdata': typed_array(group['count'].to_numpy()),
+            'line': {'color': colors[pitch_type]}, 'marker': {'color': colors[pitch_type], 'size': 8},
+            'hovertemplate': f"{pitch_type}<br>%{{x}}<br>{metric}=%{{y:.1f}}<br>%{{customdata}} pitches<extra></extra>",
+        })
+    return traces
+
+# movement ellipse of every pitch type from its covariance, all pitch types in one broadcast over
+# (pitch type, point), and a density contour per pitch type from the summed cells
+def distribution_traces(stats, cells, colors, n_points=73):
+    # closed form eigen decomposition of the 2x2 covariance matrices
+    var_x, var_y, cov_xy = stats['var_x'].to_numpy(), stats['var_y'].to_numpy(), stats['cov_xy'].to_numpy()
+    half_diff = (var_x - var_y) / 2
+    radius = np.sqrt(half_diff ** 2 + cov_xy ** 2)
+    major = np.sqrt(np.maximum((var_x + var_y) / 2 + radius, 0))[:, None]
+    minor = np.sqrt(np.maximum((var_x + var_y) / 2 - radius, 0))[:, None]
+    angle = (0.5 * np.arctan2(cov_xy, half_diff))[:, None]
+
+    t = np.linspace(0, 2 * np.pi, n_points)
+    ellipse_x = stats['mean_x'].to_numpy()[:, None] + ellipse_sigma * (major * np.cos(t) * np.cos(angle) - minor * np.sin(t) * np.sin(angle))
+    ellipse_y = stats['mean_y'].to_numpy()[:, None] + ellipse_sigma * (major * np.cos(t) * np.sin(angle) + minor * np.sin(t) * np.cos(angle))
+
+    # dense count grid of every pitch type, cell is x cell * bins + y cell
+    pitch_types = list(stats.index)
+    grid = np.zeros((len(pitch_types), compare_bins * compare_bins))
+    rows = pd.Index(pitch_types).get_indexer(cells.index.get_level_values('TaggedPitchType'))
+    grid[rows, cells.index.get_level_values('cell').to_numpy()] = cells.to_numpy()
+    centers = -25 + (np.arange(compare_bins) + 0.5) * 50 / compare_bins
+
+    traces = []
+    for i, pitch_type in enumerate(pitch_types):
+        color = colors[pitch_type]
+        if grid[i].any():
+            traces.append({
+                'type': 'contour', 'name': pitch_type, 'legendgroup': pitch_type, 'showlegend': False, 'showscale': False,
+                'x': typed_array(centers), 'y': typed_array(centers), 'z': grid[i].reshape(compare_bins, compare_bins).T.tolist(),
+                'contours': {'coloring': 'lines', 'start': 1}, 'ncontours': 5, 'colorscale': [[0, color], [1, color]],
+                'line': {'width': 1}, 'opacity': 0.6, 'hoverinfo': 'skip',
+            })
+        traces.append({
+            'type': 'scatter', 'mode': 'lines', 'name': pitch_type, 'legendgroup': pitch_type,
+            'x': typed_array(ellipse_x[i]), 'y': typed_array(ellipse_y[i]), 'line': {'color': color, 'width': 2},
+            'hovertemplate': f"{pitch_type}: HB %{{x:.1f}}, IVB %{{y:.1f}}<extra></extra>",
+        })
+        traces.append({
+            'type': 'scatter', 'mode': 'markers', 'name': pitch_type, 'legendgroup': pitch_type, 'showlegend': False,
+            'x': [stats['mean_x'].iloc[i]], 'y': [stats['mean_y'].iloc[i]],
+            'marker': {'color': color, 'size': 12, 'symbol': 'x'},
+            'hovertemplate': f"{pitch_type} mean ({int(stats['count'].iloc[i])} pitches)<br>HB %{{x:.1f}}, IVB %{{y:.1f}}<extra></extra>",
+        })
+    return traces
+
+# static layout of the drift plot, the y axis title is set to the selected metric
+def build_drift_layout():
+    fig = go.Figure()
+    fig.update_xaxes(type='date', title_text='Session Date', showgrid=True, gridcolor='lightgrey')
+    fig.update_yaxes(showgrid=True, gridcolor='lightgrey')
+    fig.update_layout(
+        paper_bgcolor='white',
+        plot_bgcolor='white',
+        height=600,
+        margin=dict(t=60),
+        legend=dict(title_text='TaggedPitchType', tracegroupgap=0, orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5)
+    )
+    return fig.to_dict()['layout']
+
+drift_layout = build_drift_layout()
+distribution_layout = dict(movement_layout, showlegend=True)
+
+# Callback for the session comparison: aggregates every session once, then only combines the cached sums
+def update_comparison(contents, start_date, end_date, pitcher, metric, filenames):
+    aggregates = upload_aggregates(contents, filenames) + store_aggregates(compare_store_dir, start_date, end_date)
+    if not aggregates:
+        return default_fig, default_fig, [], None
+
+    # the uploads and sessions can all lack tagged pitches with movement, which leaves no pitcher to show
+    sums, cells = combine_aggregates(aggregates)
+    pitchers = sorted(sums.index.unique(level='Pitcher'))
+    if not pitchers:
+        return default_fig, default_fig, [], None
+    if pitcher not in pitchers:
+        pitcher = pitchers[0]
+
+    sums = sums.xs(pitcher, level='Pitcher')
+    cells = cells.xs(pitcher, level='Pitcher')
+    session_stats = movement_stats(sums)
+    pitch_stats = movement_stats(sums.groupby(level='TaggedPitchType', observed=True).sum())
+    pitch_cells = cells.groupby(level=['TaggedPitchType', 'cell'], observed=True).sum()
+
+    # the same color for a pitch type in both plots, most thrown first
+    pitch_stats = pitch_stats.sort_values('count', ascending=False)
+    colors = {pitch_type: pitch_colors[i % len(pitch_colors)] for i, pitch_type in enumerate(pitch_stats.index)}
+
+    drift_fig = {'data': drift_traces(session_stats, metric, colors),
+                 'layout': dict(drift_layout, yaxis=dict(drift_layout['yaxis'], title={'text': metric}))}
+    distribution_fig = {'data': distribution_traces(pitch_stats, pitch_cells, colors), 'layout': distribution_layout}
+    options = [{'label': name, 'value': name} for name in pitchers]
+    return drift_fig, distribution_fig, options, pitcher
 
 # Callback for handling the file upload and updating dropdown, filename display, and figures
-@app.callback(
-    [Output('movement-plot', 'figure'),
-     Output('command-plot', 'figure'),
-     Output('pitch-type-dropdown', 'options'),
-     Output('pitch-type-dropdown', 'disabled'),
-     Output('pitch-type-dropdown', 'value'),
-     Output('file-upload-name', 'children')],
-    [Input('upload-data', 'contents'),
-     Input('pitch-type-dropdown', 'value')],
-    [State('upload-data', 'filename')]
-)
 def update_output(contents, dropdown_value, filename):
     ctx = dash.callback_context
     
     # This checks what triggered the callback, making sure it only runs when the file is uploaded
     if not ctx.triggered or ctx.triggered[0]['prop_id'].split('.')[0] == 'upload-data':
         if contents:
-            df = parse_contents(contents, filename)
+            df = cached_upload(contents, filename)
             if df is not None:
                 # Set the dropdown options based on the uploaded file
-                pitch_options = [{'label': pitch_type, 'value': pitch_type} for pitch_type in df['TaggedPitchType'].unique()]
-                pitch_options.insert(0, {'label': 'All Pitches', 'value': 'All Pitches'})
+                pitch_options = pitch_type_options(df)
                 
                 # If a pitch type is already selected, filter the dataframe
-                if dropdown_value != 'All Pitches':
-                    df = df[df['TaggedPitchType'] == dropdown_value]
+                df = filter_pitch_type(df, dropdown_value)
                 
                 # Update figures
                 fig1 = create_movement_plot(df)
@@ -204,12 +660,11 @@ def update_output(contents, dropdown_value, filename):
                 # Return updated figures, dropdown options, enabled dropdown, current dropdown value, and filename
                 return fig1, fig2, pitch_options, False, 'All Pitches', filename
 
-    # This part runs if the dropdown value changes
+    # This part runs if the dropdown value changes, the upload is already parsed in the cache
     if contents and dropdown_value:
-        df = parse_contents(contents, filename)
+        df = cached_upload(contents, filename)
         if df is not None:
-            if dropdown_value != 'All Pitches':
-                df = df[df['TaggedPitchType'] == dropdown_value]
+            df = filter_pitch_type(df, dropdown_value)
             fig1 = create_movement_plot(df)
             fig2 = create_command_plot(df)
             return fig1, fig2, dash.no_update, False, dropdown_value, dash.no_update
@@ -217,6 +672,103 @@ def update_output(contents, dropdown_value, filename):
     # Return default figures, empty dropdown, disabled dropdown, 'All Pitches' value, and no filename
     return default_fig, default_fig, [], True, 'All Pitches', ""
 
-# Run the app
+# Clientside filtering: the server builds both figures for every pitch once per upload and stores them in the browser
+# px.scatter colors by pitch type, so each pitch type is one trace and only the plotted columns are sent
+def store_upload(contents, filename):
+    if contents:
+        df = cached_upload(contents, filename)
+        if df is not None:
+            figures = {'movement': create_movement_plot(df), 'command': create_command_plot(df)}
+            return figures, pitch_type_options(df), False, 'All Pitches', filename
+
+    return None, [], True, 'All Pitches', ""
+
+# shows the traces of the selected pitch type, runs in the browser
+filter_figures_js = """
+function(pitchType, figures) {
+    if (!figures) {
+        return [window.dash_clientside.no_update, window.dash_clientside.no_update];
+    }
+    const filter = function(fig) {
+        const data = fig.data.map(function(trace) {
+            return Object.assign({}, trace, {visible: pitchType === 'All Pitches' || trace.name === pitchType});
+        });
+        return Object.assign({}, fig, {data: data});
+    };
+    return [filter(figures.movement), filter(figures.command)];
+}
+"""
+
+# diskcache manager for background callbacks, None when diskcache (and multiprocess) is not installed
+def background_manager(cache_dir=background_cache_dir):
+    try:
+        import diskcache
+        return dash.DiskcacheManager(diskcache.Cache(cache_dir))
+    except ImportError:
+        return None
+
+# build the dashboard, one app per server process
+def create_app():
+    manager = background_manager() if background_callbacks else None
+    background = manager is not None
+
+    app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP], background_callback_manager=manager)
+    app.layout = layout
+
+    if clientside_filtering:
+        app.callback(
+            [Output('upload-figures', 'data'),
+             Output('pitch-type-dropdown', 'options'),
+             Output('pitch-type-dropdown', 'disabled'),
+             Output('pitch-type-dropdown', 'value'),
+             Output('file-upload-name', 'children')],
+            [Input('upload-data', 'contents')],
+            [State('upload-data', 'filename')],
+            background=background
+        )(store_upload)
+
+        app.clientside_callback(
+            filter_figures_js,
+            [Output('movement-plot', 'figure'),
+             Output('command-plot', 'figure')],
+            [Input('pitch-type-dropdown', 'value'),
+             Input('upload-figures', 'data')]
+        )
+    else:
+        app.callback(
+            [Output('movement-plot', 'figure'),
+             Output('command-plot', 'figure'),
+             Output('pitch-type-dropdown', 'options'),
+             Output('pitch-type-dropdown', 'disabled'),
+             Output('pitch-type-dropdown', 'value'),
+             Output('file-upload-name', 'children')],
+            [Input('upload-data', 'contents'),
+             Input('pitch-type-dropdown', 'value')],
+            [State('upload-data', 'filename')],
+            background=background
+        )(update_output)
+
+    app.callback(
+        [Output('drift-plot', 'figure'),
+         Output('distribution-plot', 'figure'),
+         Output('compare-pitcher-dropdown', 'options'),
+         Output('compare-pitcher-dropdown', 'value')],
+        [Input('upload-sessions', 'contents'),
+         Input('compare-store-dates', 'start_date'),
+         Input('compare-store-dates', 'end_date'),
+         Input('compare-pitcher-dropdown', 'value'),
+         Input('compare-metric-dropdown', 'value')],
+        [State('upload-sessions', 'filename')],
+        background=background
+    )(update_comparison)
+
+    return app
+
+# app and WSGI server, serve with several workers with e.g. gunicorn -w 4 pitch_dash:server
+# or waitress-serve --threads 8 pitch_dash:server (the upload and comparison caches are locked for threads)
+app = create_app()
+server = app.server
+
+# Run the development server
 if __name__ == '__main__':
-    app.run_server(debug=True)
+    app.run(debug=True)
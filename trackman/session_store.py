@@ -0,0 +1,179 @@
+import os
+import re
+import argparse
+import datetime
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+# columns kept from a raw TrackMan export and the types they are stored with
+# PitchNo is nullable, some exports leave it blank
+csv_dtypes = {
+    'PitchNo': 'Int32',
+    'Date': 'str',
+    'Pitcher': 'str',
+    'TaggedPitchType': 'category',
+    'RelSpeed': 'float32',
+    'SpinRate': 'float32',
+    'Tilt': 'str',
+    'InducedVertBreak': 'float32',
+    'HorzBreak': 'float32',
+    'PlateLocHeight': 'float32',
+    'PlateLocSide': 'float32',
+}
+store_columns = list(csv_dtypes)
+
+# fixed schema of the store, the last two fields are the partition keys
+schema = pa.schema([
+    ('PitchNo', pa.int32()),
+    ('Date', pa.string()),
+    ('Pitcher', pa.string()),
+    ('TaggedPitchType', pa.dictionary(pa.int8(), pa.string())),
+    ('RelSpeed', pa.float32()),
+    ('SpinRate', pa.float32()),
+    ('Tilt', pa.string()),
+    ('InducedVertBreak', pa.float32()),
+    ('HorzBreak', pa.float32()),
+    ('PlateLocHeight', pa.float32()),
+    ('PlateLocSide', pa.float32()),
+    ('session_date', pa.date32()),
+    ('pitcher_key', pa.string()),
+])
+
+# store layout: STORE/session_date=YYYY-MM-DD/pitcher_key=Last_First/<csv name>-0.parquet
+partitioning = ds.partitioning(pa.schema([schema.field('session_date'), schema.field('pitcher_key')]), flavor='hive')
+
+# convert name from Last, First to a Last_First directory name
+def pitcher_key(name):
+    return "_".join(name.split(", ")).replace(" ", "_")
+
+# every date from start to end, inclusive, as YYYY-MM-DD folder names
+def date_range(start, end):
+    for offset in range((end - start).days + 1):
+        yield (start + datetime.timedelta(days=offset)).strftime("%Y-%m-%d")
+
+# downloaded session csvs in the YYYY-MM-DD folders of data_root from start to end
+def session_csvs(data_root, start, end):
+    paths = []
+    for date_str in date_range(start, end):
+        data_dir = os.path.join(data_root, date_str)
+        if os.path.isdir(data_dir):
+            paths.extend(os.path.join(data_dir, filename) for filename in sorted(os.listdir(data_dir)) if filename.endswith(".csv"))
+    return paths
+
+# read only the store columns of a raw TrackMan csv
+# older or trimmed exports lack some columns (Tilt, SpinRate, PlateLocHeight/Side, PitchNo),
+# those are added as nulls of their store type so every caller gets the same frame
+def read_trackman_csv(csv_path, columns=None):
+    columns = columns or store_columns
+    df = pd.read_csv(csv_path, usecols=lambda col: col in columns, dtype={col: csv_dtypes[col] for col in columns if col in csv_dtypes})
+    for col in columns:
+        if col not in df.columns:
+            df[col] = pd.Series(index=df.index, dtype=csv_dtypes.get(col, 'float64'))
+    return df[columns]
+
+# remove the part files an earlier ingest of a csv wrote, from every partition of the store
+# the csv's date or pitcher may have changed since, so its old files can sit in any partition
+# partition folders left empty are removed so they are not read as sessions
+def remove_csv_parts(basename, store_dir):
+    if not os.path.isdir(store_dir):
+        return
+    part_name = re.compile(rf"{re.escape(basename)}-\d+\.parquet")
+    for day in os.scandir(store_dir):
+        if not day.is_dir():
+            continue
+        for session in os.scandir(day.path):
+            if not session.is_dir():
+                continue
+            for part in os.scandir(session.path):
+                if part_name.fullmatch(part.name):
+                    os.remove(part.path)
+            if not os.listdir(session.path):
+                os.rmdir(session.path)
+        if not os.listdir(day.path):
+            os.rmdir(day.path)
+
+# convert one downloaded session csv into the store
+def ingest_csv(csv_path, store_dir):
+    df = read_trackman_csv(csv_path)
+    df = df.dropna(subset=['Pitcher', 'Date'])
+
+    # partition keys
+    df['session_date'] = pd.to_datetime(df['Date'], format='mixed').dt.date
+    df['pitcher_key'] = df['Pitcher'].map(pitcher_key)
+
+    table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+    # files are named after the csv, so ingesting a csv again removes its own files first
+    # and leaves other sessions in the same partitions alone
+    basename = os.path.splitext(os.path.basename(csv_path))[0]
+    remove_csv_parts(basename, store_dir)
+    ds.write_dataset(table, store_dir, format='parquet', partitioning=partitioning,
+                     basename_template=f"{basename}-{{i}}.parquet", existing_data_behavior='overwrite_or_ignore')
+
+    return len(df)
+
+# convert every csv below data_root into the store
+def ingest_dir(data_root, store_dir):
+    ingested = 0
+    for dirpath, dirnames, filenames in os.walk(data_root):
+        for filename in sorted(filenames):
+            if filename.endswith(".csv"):
+                ingested += ingest_csv(os.path.join(dirpath, filename), store_dir)
+    return ingested
+
+# query the store, only the requested columns are read and only the matching
+# date and pitcher partitions are opened
+def read_store(store_dir, columns=None, pitchers=None, start_date=None, end_date=None, pitch_types=None):
+    dataset = ds.dataset(store_dir, format='parquet', partitioning=partitioning)
+
+    filters = []
+    if pitchers is not None:
+        filters.append(ds.field('pitcher_key').isin([pitcher_key(name) for name in pitchers]))
+    if start_date is not None:
+        filters.append(ds.field('session_date') >= pd.Timestamp(start_date).date())
+    if end_date is not None:
+        filters.append(ds.field('session_date') <= pd.Timestamp(end_date).date())
+    if pitch_types is not None:
+        filters.append(ds.field('TaggedPitchType').isin(pitch_types))
+
+    expression = None
+    for f in filters:
+        expression = f if expression is None else expression & f
+
+    return dataset.to_table(columns=columns, filter=expression).to_pandas()
+
+# partition folders of the store between two dates, one per pitcher and session date
+def session_partitions(store_dir, start_date=None, end_date=None):
+    start = pd.Timestamp(start_date).strftime("%Y-%m-%d") if start_date is not None else None
+    end = pd.Timestamp(end_date).strftime("%Y-%m-%d") if end_date is not None else None
+
+    for day in sorted(os.scandir(store_dir), key=lambda entry: entry.name):
+        date_str = day.name.partition('=')[2]
+        if not day.is_dir() or (start and date_str < start) or (end and date_str > end):
+            continue
+        for session in sorted(os.scandir(day.path), key=lambda entry: entry.name):
+            if session.is_dir():
+                yield session.path
+
+# load a single session from either a raw csv or a store partition directory
+def load_session(path, columns=None):
+    if os.path.isdir(path):
+        return ds.dataset(path, format='parquet').to_table(columns=columns).to_pandas()
+    return read_trackman_csv(path, columns)
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert downloaded TrackMan sessions into the columnar session store.")
+    parser.add_argument('data_root', help="csv file or folder of downloaded sessions, searched recursively")
+    parser.add_argument('store_dir', help="root folder of the session store")
+    args = parser.parse_args()
+
+    if os.path.isdir(args.data_root):
+        ingested = ingest_dir(args.data_root, args.store_dir)
+    else:
+        ingested = ingest_csv(args.data_root, args.store_dir)
+
+    print(f"Ingested {ingested} pitches into {args.store_dir}.")
+
+if __name__ == '__main__':
+    main()
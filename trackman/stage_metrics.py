@@ -0,0 +1,81 @@
+import sys
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# psutil gives the current resident set size on every platform, without it only the growth of the peak rss
+# from the resource module is recorded (unix only), under its own key, and nothing at all on windows
+try:
+    import psutil
+    _process = psutil.Process()
+except ImportError:
+    psutil = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# resident memory of this process in bytes, None without psutil
+def rss_bytes():
+    if psutil is not None:
+        return _process.memory_info().rss
+    return None
+
+# peak resident memory of this process so far in bytes, None when the resource module is missing
+def maxrss_bytes():
+    if resource is not None:
+        # ru_maxrss is in kilobytes on linux and bytes on macos
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == 'darwin' else maxrss * 1024
+    return None
+
+# wall time, cpu time and rss change per stage, and peak traced memory per stage while tracemalloc is running
+# a stage entered more than once (e.g. once per file) accumulates
+class StageTimer:
+
+    def __init__(self):
+        self.wall = {}
+        self.cpu = {}
+        self.rss = {}
+        self.maxrss = {}
+        self.peak = {}
+
+    @contextmanager
+    def stage(self, name):
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        rss_start = rss_bytes()
+        maxrss_start = maxrss_bytes() if rss_start is None else None
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.wall[name] = self.wall.get(name, 0.0) + time.perf_counter() - start
+            self.cpu[name] = self.cpu.get(name, 0.0) + time.process_time() - cpu_start
+            if rss_start is not None:
+                self.rss[name] = self.rss.get(name, 0) + rss_bytes() - rss_start
+            if maxrss_start is not None:
+                self.maxrss[name] = self.maxrss.get(name, 0) + maxrss_bytes() - maxrss_start
+            if tracing:
+                self.peak[name] = max(self.peak.get(name, 0), tracemalloc.get_traced_memory()[1] - base)
+
+    # {stage: {'wall': seconds, 'cpu': seconds, 'rss_delta': bytes or None}}, plus 'maxrss_delta' (growth of
+    # the peak rss in bytes) when rss is measured from the resource module instead of psutil
+    def as_dict(self):
+        stages = {}
+        for name in self.wall:
+            stages[name] = {'wall': round(self.wall[name], 6), 'cpu': round(self.cpu[name], 6), 'rss_delta': self.rss.get(name)}
+            if name in self.maxrss:
+                stages[name]['maxrss_delta'] = self.maxrss[name]
+        return stages
+
+# append records to a json lines file, one object per line
+def append_jsonl(path, records):
+    with open(path, 'a') as f:
+        for record in records:
+            f.write(json.dumps(record) + '\n')
@@ -0,0 +1,95 @@
+import os
+import argparse
+import datetime
+import numpy as np
+import pandas as pd
+from session_store import date_range
+
+# typical right handed movement profile per pitch type: velo, spin, IVB, HB, spin axis tilt
+pitch_profiles = {
+    'Fastball': (92.0, 2300, 16.0, 8.0, '1:00'),
+    'Sinker': (91.0, 2150, 8.0, 15.0, '2:00'),
+    'Cutter': (87.0, 2400, 9.0, -2.0, '12:30'),
+    'Slider': (84.0, 2500, 2.0, -6.0, '9:30'),
+    'Curveball': (78.0, 2600, -10.0, -8.0, '7:00'),
+    'ChangeUp': (84.0, 1750, 7.0, 14.0, '2:30'),
+    'Splitter': (85.0, 1400, 3.0, 9.0, '2:00'),
+    'Sweeper': (81.0, 2700, 0.0, -15.0, '9:00'),
+}
+
+# other columns of a real export that the scripts never read, kept so parsing cost is realistic
+filler_columns = ['Time', 'PAofInning', 'PitchofPA', 'PitcherId', 'PitcherThrows', 'PitcherTeam', 'BatterSide',
+                  'AutoPitchType', 'PitchCall', 'Balls', 'Strikes', 'VertRelAngle', 'HorzRelAngle', 'SpinAxis',
+                  'RelHeight', 'RelSide', 'Extension', 'VertBreak', 'ZoneSpeed', 'VertApprAngle', 'HorzApprAngle',
+                  'ZoneTime', 'pfxx', 'pfxz', 'x0', 'y0', 'z0', 'vx0', 'vy0', 'vz0', 'ax0', 'ay0', 'az0']
+
+first_names = ['Adam', 'Ben', 'Carlos', 'Derek', 'Evan', 'Felix', 'Gabe', 'Hunter', 'Ian', 'Jake', 'Kyle', 'Luis']
+last_names = ['Bloebaum', 'Alvarez', 'Brooks', 'Castillo', 'Diaz', 'Ellis', 'Foster', 'Garcia', 'Hayes', 'Ito',
+              'Jensen', 'Kim', 'Lopez', 'Moreno', 'Nolan', 'Ortiz', 'Perez', 'Quinn', 'Reyes', 'Soto']
+
+# pitcher names "Last, First", repeatable for a given index
+def pitcher_name(i):
+    return f"{last_names[i % len(last_names)]}{'' if i < len(last_names) else i // len(last_names)}, {first_names[i % len(first_names)]}"
+
+# one bullpen session in the TrackMan csv layout
+def make_session(rng, pitcher, session_date, n_pitches=40, n_pitch_types=4):
+    pitch_types = list(pitch_profiles)[:n_pitch_types]
+    tagged = rng.choice(pitch_types, size=n_pitches)
+    profile = np.array([pitch_profiles[t][:4] for t in tagged], dtype=float)
+
+    # small per pitcher offset so pitchers differ, then pitch to pitch noise
+    offset = rng.normal(0, [1.5, 80, 1.5, 1.5])
+    noise = rng.normal(0, [1.0, 60, 2.0, 2.0], size=(n_pitches, 4))
+    metrics = profile + offset + noise
+
+    df = pd.DataFrame({
+        'PitchNo': np.arange(1, n_pitches + 1),
+        'Date': session_date.strftime("%m/%d/%Y"),
+        'Pitcher': pitcher,
+        'TaggedPitchType': tagged,
+        'RelSpeed': metrics[:, 0].round(5),
+        'SpinRate': metrics[:, 1].round(3),
+        'Tilt': [pitch_profiles[t][4] for t in tagged],
+        'InducedVertBreak': metrics[:, 2].round(5),
+        'HorzBreak': metrics[:, 3].round(5),
+        'PlateLocHeight': rng.normal(2.5, 0.7, n_pitches).round(5),
+        'PlateLocSide': rng.normal(0.0, 0.7, n_pitches).round(5),
+    })
+
+    for col in filler_columns:
+        df[col] = rng.normal(0, 10, n_pitches).round(5)
+
+    return df
+
+# write sessions_per_day session csvs into a YYYY-MM-DD folder under out_root for each day, returns the paths
+def generate(out_root, start, days=1, sessions_per_day=60, pitches_per_session=40, n_pitch_types=4, seed=0):
+    rng = np.random.default_rng(seed)
+    paths = []
+    for date_str in date_range(start, start + datetime.timedelta(days=days - 1)):
+        day_dir = os.path.join(out_root, date_str)
+        os.makedirs(day_dir, exist_ok=True)
+        session_date = datetime.date.fromisoformat(date_str)
+        for i in range(sessions_per_day):
+            pitcher = pitcher_name(i)
+            df = make_session(rng, pitcher, session_date, pitches_per_session, n_pitch_types)
+            path = os.path.join(day_dir, f"{date_str.replace('-', '')}-{pitcher.replace(', ', '_')}.csv")
+            df.to_csv(path, index=False)
+            paths.append(path)
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic TrackMan session csvs.")
+    parser.add_argument('out_root', help="folder to write YYYY-MM-DD session folders into")
+    parser.add_argument('--start', type=datetime.date.fromisoformat, default=datetime.date(2024, 2, 1), help="first session date")
+    parser.add_argument('--days', type=int, default=1, help="number of days")
+    parser.add_argument('--sessions', type=int, default=60, help="sessions per day")
+    parser.add_argument('--pitches', type=int, default=40, help="pitches per session")
+    parser.add_argument('--pitch-types', type=int, default=4, choices=range(1, len(pitch_profiles) + 1), help="pitch types per pitcher")
+    parser.add_argument('--seed', type=int, default=0, help="random seed")
+    args = parser.parse_args()
+
+    paths = generate(args.out_root, args.start, args.days, args.sessions, args.pitches, args.pitch_types, args.seed)
+    print(f"Wrote {len(paths)} sessions to {args.out_root}.")
+
+if __name__ == '__main__':
+    main()